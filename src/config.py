@@ -42,4 +42,8 @@ CONFIG = load_config()
 
 # Paths (derived from config or defaults)
 DATA_DIR = BASE_DIR / CONFIG.get("paths", {}).get("data_dir", "data")
-GLOBAL_TRACKER_PATH = DATA_DIR / "global_tracker.csv"
+GLOBAL_TRACKER_PATH = DATA_DIR / "global_tracker.csv" # Legacy CSV: migrated once, kept as export target
+GLOBAL_TRACKER_DB_PATH = DATA_DIR / "global_tracker.db"
+
+# Orchestrator log and scraper metrics (relative to the working directory, like the orchestrator)
+LOG_DIR = Path("scrapping_outputs")
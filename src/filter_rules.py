@@ -0,0 +1,112 @@
+"""
+Reglas compiladas del Step 2 por término de búsqueda.
+
+Cada search item se compila una vez en un `RuleSet`: palabras excluidas al inicio y en
+cualquier posición (ficheros `first_word_blacklist.txt` / `rest_of_words_blacklist.txt`
+de `blacklist_dir`, o las listas inline `start_exclude_keywords` / `exclude_keywords`),
+tokens obligatorios del término y límites de precio. Los `RuleSet` se guardan en caché
+durante la ejecución y solo se recompilan cuando cambia el mtime de los ficheros de la
+blacklist (comprobado como mucho cada `RELOAD_CHECK_SECONDS`), así un proceso largo
+recoge las ediciones sin leer ficheros por cada anuncio.
+"""
+import logging
+import re
+import time
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+# Split by non-alphanumeric characters AND split numbers from letters (e.g. "11pro" -> "11", "pro")
+# This allows "iPhone 11pro" to match "iPhone 11"
+TOKEN_PATTERN = r'[a-zA-Z]+|\d+'
+
+FIRST_WORD_FILE = "first_word_blacklist.txt"
+REST_OF_WORDS_FILE = "rest_of_words_blacklist.txt"
+
+# Minimum seconds between two mtime checks of the same rule set
+RELOAD_CHECK_SECONDS = 2.0
+
+_cache = {}
+
+def _read_keywords(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return set(line.strip().lower() for line in f if line.strip())
+
+class RuleSet:
+    """Step 2 rules of one search term, compiled from its search item config."""
+
+    def __init__(self, item_config):
+        self.search_term = item_config["name"].lower()
+        self.start_exclude_keywords = set()
+        self.exclude_keywords = set()
+        self.files = []
+
+        if "blacklist_dir" in item_config:
+            blacklist_path = Path(item_config["blacklist_dir"])
+            first_word_file = blacklist_path / FIRST_WORD_FILE
+            rest_file = blacklist_path / REST_OF_WORDS_FILE
+            self.files = [first_word_file, rest_file]
+            if first_word_file.exists():
+                self.start_exclude_keywords = _read_keywords(first_word_file)
+            if rest_file.exists():
+                self.exclude_keywords = _read_keywords(rest_file)
+        else:
+            # Fallback to config lists (legacy support or inline config)
+            self.start_exclude_keywords = set(k.lower() for k in item_config.get("start_exclude_keywords", []))
+            self.exclude_keywords = set(k.lower() for k in item_config.get("exclude_keywords", []))
+
+        # ALL tokens of the search term must be in the title
+        self.required_tokens = set(re.findall(TOKEN_PATTERN, self.search_term))
+
+        filters = item_config.get("filters", {})
+        self.min_price = filters.get("precio_min", 0) or 0
+        self.max_price = filters.get("precio_max") or None
+
+        self.signature = self.file_signature()
+        self.checked_at = time.monotonic()
+
+    def file_signature(self):
+        """mtime of every blacklist file (None if missing): changes when a file is edited."""
+        signature = []
+        for path in self.files:
+            try:
+                signature.append(path.stat().st_mtime_ns)
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def is_stale(self):
+        """True if a blacklist file changed since compiling (checked at most every RELOAD_CHECK_SECONDS)."""
+        if not self.files:
+            return False
+        now = time.monotonic()
+        if now - self.checked_at < RELOAD_CHECK_SECONDS:
+            return False
+        self.checked_at = now
+        return self.file_signature() != self.signature
+
+def _cache_key(item_config):
+    filters = item_config.get("filters", {})
+    return (
+        item_config["name"].lower(),
+        item_config.get("blacklist_dir"),
+        tuple(item_config.get("start_exclude_keywords", [])),
+        tuple(item_config.get("exclude_keywords", [])),
+        filters.get("precio_min"),
+        filters.get("precio_max"),
+    )
+
+def get_rule_set(item_config):
+    """Compiled rules for `item_config`, recompiled only if its blacklist files changed."""
+    key = _cache_key(item_config)
+    rule_set = _cache.get(key)
+    if rule_set is not None and not rule_set.is_stale():
+        return rule_set
+    if rule_set is not None:
+        logger.info(f"Blacklist for '{item_config['name']}' changed on disk: reloading rules.")
+    rule_set = RuleSet(item_config)
+    _cache[key] = rule_set
+    return rule_set
+
+def clear_cache():
+    _cache.clear()
@@ -0,0 +1,202 @@
+"""
+Backend HTTP/JSON para el Step 1 (alternativa a Selenium).
+
+Consulta directamente el endpoint JSON de búsqueda que usa el frontend de Wallapop,
+con la misma semántica de query que `build_url` (keywords, distancia, condiciones,
+coordenadas), y pagina con el cursor `next_page` del servidor en lugar de hacer scroll.
+Produce exactamente el mismo esquema de CSV que el scraper con navegador.
+
+La URL del endpoint se puede redirigir (env `WALLAPOP_API_URL` o `scraping.http.api_url`)
+a un servidor local que sirva páginas JSON grabadas (ver `tools/fake_search_server.py`).
+"""
+import hashlib
+import json
+import logging
+import os
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from .config import CONFIG, BASE_DIR
+from .utils import slugify
+from . import pacing
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = "https://api.wallapop.com/api/v3/search"
+ITEM_URL = "https://es.wallapop.com/item/{slug}"
+CURRENCY_SYMBOLS = {"EUR": "€"}
+
+def http_config():
+    return CONFIG["scraping"].get("http", {})
+
+def get_api_url():
+    return os.getenv("WALLAPOP_API_URL") or http_config().get("api_url", DEFAULT_API_URL)
+
+def create_session():
+    """Pooled requests session with retries on transient server errors."""
+    session = requests.Session()
+    # No 429 here: a retried 429 ends in RetryError before fetch_cards sees it, and
+    # throttling must reach pacing.report_block() so every worker backs off
+    retry = Retry(
+        total=3,
+        backoff_factor=1.0,
+        status_forcelist=[500, 502, 503, 504],
+        allowed_methods=["GET"],
+    )
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=8, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    user_agent = "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/124.0 Safari/537.36"
+    try:
+        from fake_useragent import UserAgent
+        user_agent = UserAgent().random
+    except Exception as e:
+        logger.warning(f"Could not load fake-useragent: {e}. using default.")
+
+    session.headers.update({
+        "User-Agent": user_agent,
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "es-ES,es;q=0.9",
+        "Origin": "https://es.wallapop.com",
+        "Referer": "https://es.wallapop.com/",
+        "X-DeviceOS": "0",
+    })
+    return session
+
+def format_price(amount, currency="EUR"):
+    """Formats a numeric price the way the web grid shows it (e.g. '1.200 €', '10,50 €')."""
+    if amount is None:
+        return "0"
+    symbol = CURRENCY_SYMBOLS.get(currency, currency or "")
+    value = float(amount)
+    if value.is_integer():
+        text = f"{int(value):,}".replace(",", ".")
+    else:
+        text = f"{value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"{text} {symbol}".strip()
+
+def item_to_card(item):
+    """Maps one API search item to the raw card record used by the DOM extractor."""
+    slug = item.get("web_slug") or ""
+    price = item.get("price") or {}
+    if not isinstance(price, dict):
+        price = {"amount": price, "currency": item.get("currency", "EUR")}
+    reserved = item.get("reserved") or {}
+    if isinstance(reserved, dict):
+        reserved = reserved.get("flag", False)
+
+    return {
+        # Same id as the DOM path: numeric suffix of the slug (not the API hash id)
+        "id": slug.split("-")[-1] if slug else str(item.get("id")),
+        "href": ITEM_URL.format(slug=slug),
+        "title": (item.get("title") or "No Title").strip(),
+        "price": format_price(price.get("amount"), price.get("currency", "EUR")),
+        "reserved": bool(reserved),
+    }
+
+def parse_search_page(payload):
+    """Returns (items, next_page) from a search response body."""
+    data = payload.get("data", {})
+    section = data.get("section", {}).get("payload", {})
+    items = section.get("items")
+    if items is None:
+        # Older response shape
+        items = payload.get("search_objects", [])
+    next_page = payload.get("meta", {}).get("next_page")
+    return items, next_page
+
+def recording_name(params):
+    """
+    File name prefix of the recorded pages of one search: keywords slug plus a digest of
+    the whole first-page query, so the same term in another city or price band does not
+    overwrite them. `tools/fake_search_server.py` derives it from the request the same way.
+    """
+    params = [(k, v) for k, v in params if k != "source"]
+    keywords = next((v for k, v in params if k == "keywords"), "")
+    digest = hashlib.sha1(json.dumps(sorted(params)).encode("utf-8")).hexdigest()[:8]
+    return f"{slugify(keywords)}-{digest}"
+
+def _record_page(params, page_number, payload):
+    record_dir = http_config().get("record_dir")
+    if not record_dir:
+        return
+    path = BASE_DIR / record_dir
+    path.mkdir(parents=True, exist_ok=True)
+    with open(path / f"{recording_name(params)}_{page_number:03d}.json", "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False)
+
+def fetch_cards(session, item_config):
+    """
+    Pages through the JSON search for one item.
+    Returns (raw card records, stop info) where stop info mirrors the browser's
+    `scroll_stop` (reason "max_pages" when results were left behind).
+    """
+    # Imported here to avoid a circular import (step1_scraper selects this backend)
+    from .step1_scraper import build_search_params
+
+    api_url = get_api_url()
+    max_pages = http_config().get("max_pages", 25)
+    base_params = [("source", "search_box")] + build_search_params(item_config)
+
+    cards = []
+    seen = set()
+    next_page = None
+    for page_number in range(max_pages):
+        params = [("next_page", next_page)] if next_page else base_params
+        pacing.pace("page") # Every request, including an item's first page
+        response = session.get(api_url, params=params, timeout=20)
+
+        if response.status_code in (403, 429):
+            pacing.report_block()
+        if response.status_code == 403:
+            raise Exception(f"Navegación bloqueada por CloudFront/Wallapop (HTTP 403 en {api_url})")
+        response.raise_for_status()
+
+        pacing.report_ok()
+        payload = response.json()
+        _record_page(base_params, page_number, payload)
+
+        items, next_page = parse_search_page(payload)
+        for item in items:
+            card = item_to_card(item)
+            if card["id"] not in seen:
+                seen.add(card["id"])
+                cards.append(card)
+
+        logger.info(f"Page {page_number + 1}: {len(items)} items (total {len(cards)})")
+        if not next_page or not items:
+            break
+
+    reason = "max_pages" if next_page and items else "end"
+    return cards, {"reason": reason, "pages": page_number + 1, "max_pages": max_pages}
+
+def scrape_item_http(session, item_config):
+    """HTTP counterpart of `scrape_item`: same DataFrame schema, no browser."""
+    from .step1_scraper import cards_to_dataframe
+    from .scrape_metrics import ScrapeMetrics
+    from . import result_cache
+
+    cached = result_cache.get(item_config)
+    if cached is not None:
+        return cached
+    metrics = ScrapeMetrics(item_config, backend="http")
+    try:
+        cards, stop = fetch_cards(session, item_config)
+        metrics.lap("fetch")
+        metrics.set("stop_reason", stop["reason"])
+        logger.info(f"Found {len(cards)} items via HTTP search.")
+        if not cards:
+            raise Exception("Scraping failed: No items returned by the search API.")
+        df = cards_to_dataframe(cards, item_config)
+        df.attrs["scroll_stop"] = stop
+        metrics.lap("extract")
+    except Exception as e:
+        metrics.finish("error", e)
+        raise
+    metrics.count("cards_extracted", len(df))
+    metrics.finish()
+    result_cache.put(item_config, df)
+    return df
@@ -2,12 +2,13 @@ import argparse
 import sys
 import time
 import logging
+from functools import partial
 from datetime import datetime
 from pathlib import Path
-from .config import CONFIG
+from .config import CONFIG, LOG_DIR
 
 # Setup logging
-log_dir = Path("scrapping_outputs")
+log_dir = LOG_DIR
 log_dir.mkdir(exist_ok=True)
 timestamp = datetime.now().strftime("%Y%m%d_%H%M")
 log_file = log_dir / f"orchestrator_{timestamp}.log"
@@ -39,7 +40,7 @@ def run_step(step_func, step_name, max_retries=3):
                 return False
     return False
 
-from .step1_scraper import run_scraper
+from .step1_scraper import run_scraper, run_replay
 from .step2_filter_initial import run_initial_filter
 from .step3_filter_logic import run_business_logic_filter
 from .step4_enrich_gemini_basic import run_gemini_enrichment
@@ -49,13 +50,21 @@ from .notifier import notify_completion, notify_error
 def main():
     parser = argparse.ArgumentParser(description="Wallascrap V2 Orchestrator")
     parser.add_argument("--pipeline", type=str, default="full", help="Pipeline to run: full, custom")
+    parser.add_argument("--scraper-backend", type=str, choices=["selenium", "http"], default=None,
+                        help="Step 1 backend: selenium (browser) or http (JSON search API). Defaults to config.")
+    parser.add_argument("--replay", type=str, default=None, metavar="DIR",
+                        help="Run the pipeline from saved HTML snapshots in DIR instead of scraping (no browser).")
     args = parser.parse_args()
 
     logger.info(f"Initialization complete. Config loaded. Log file: {log_file}")
     
     try:
-        # 1. Scraper
-        if not run_step(run_scraper, "Step 1: Scraper"):
+        # 1. Scraper (or offline replay of saved snapshots)
+        if args.replay:
+            step1 = partial(run_replay, args.replay)
+        else:
+            step1 = partial(run_scraper, backend=args.scraper_backend)
+        if not run_step(step1, "Step 1: Scraper"):
             notify_error("Step 1 failed.")
             sys.exit(1)
             
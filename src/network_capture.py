@@ -0,0 +1,86 @@
+"""
+Captura de resultados de búsqueda desde la red (CDP) para el Step 1.
+
+La rejilla de resultados se rellena con respuestas XHR/fetch del endpoint JSON de
+búsqueda, que ya traen el listado estructurado. Con `network_capture.enabled`, el
+scraper lee esas respuestas de los eventos de red del log de rendimiento de Chrome
+(`Network.responseReceived` + `Network.getResponseBody`) y las decodifica con los
+mismos mapeos que el backend HTTP (`http_search.item_to_card`), en lugar de
+reconstruir los datos a partir de subcadenas de clases CSS.
+
+La primera tanda de resultados viene renderizada en el HTML (sin XHR), así que los
+anuncios que solo están en el DOM se completan con la extracción DOM, que sigue
+siendo el camino de respaldo si no se captura nada.
+"""
+import base64
+import json
+import logging
+
+from .config import CONFIG
+from .http_search import item_to_card, parse_search_page
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_URL_PATTERNS = ["api.wallapop.com/api/v3/search"]
+
+def capture_config():
+    return CONFIG["scraping"].get("network_capture", {})
+
+def is_enabled():
+    return bool(capture_config().get("enabled", False))
+
+def enable_capture(driver):
+    """Enables the Network domain with room to keep search response bodies until we read them."""
+    if not is_enabled():
+        return
+    try:
+        driver.execute_cdp_cmd("Network.enable", {
+            "maxTotalBufferSize": 64 * 1_048_576,
+            "maxResourceBufferSize": 8 * 1_048_576,
+        })
+    except Exception as e:
+        logger.warning(f"Could not enable network capture via CDP: {e}")
+
+def search_response_ids(events):
+    """Request ids of finished search responses (JSON, HTTP 200) among CDP Network events."""
+    patterns = capture_config().get("url_patterns", DEFAULT_URL_PATTERNS)
+    candidates = {}
+    finished = set()
+    for event in events:
+        params = event.get("params", {})
+        if event["method"] == "Network.responseReceived":
+            response = params.get("response", {})
+            url = response.get("url", "")
+            if response.get("status") == 200 and "json" in response.get("mimeType", "") and any(p in url for p in patterns):
+                candidates[params["requestId"]] = url
+        elif event["method"] == "Network.loadingFinished":
+            finished.add(params.get("requestId"))
+    return [request_id for request_id in candidates if request_id in finished]
+
+def response_json(driver, request_id):
+    body = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+    text = body["body"]
+    if body.get("base64Encoded"):
+        text = base64.b64decode(text).decode("utf-8")
+    return json.loads(text)
+
+def capture_cards(driver, events):
+    """Raw card records (same shape as the DOM extractor) decoded from captured search responses."""
+    cards = []
+    seen = set()
+    request_ids = search_response_ids(events or [])
+    for request_id in request_ids:
+        try:
+            items, _ = parse_search_page(response_json(driver, request_id))
+        except Exception as e:
+            # Bodies are evicted from Chrome's buffer under memory pressure
+            logger.debug(f"Could not read search response {request_id}: {e}")
+            continue
+        for item in items:
+            card = item_to_card(item)
+            if card["id"] not in seen:
+                seen.add(card["id"])
+                cards.append(card)
+    if request_ids:
+        logger.info(f"Network capture: {len(cards)} listings from {len(request_ids)} search responses.")
+    return cards
@@ -0,0 +1,164 @@
+"""
+Planificador central de ritmo (politeness) para el Step 1.
+
+Toda navegación, scroll, búsqueda del botón "Cargar más" o página HTTP pasa por
+`pace(action)`, que combina:
+1.  **Token bucket global**: limita la tasa total de acciones (compartido entre los
+    procesos del pool, así la paralelización no multiplica la tasa que ve Wallapop).
+2.  **Retardo base por acción con jitter**, para no tener un ritmo perfectamente regular.
+3.  **Backoff adaptativo**: un multiplicador que sube cuando `check_for_block` detecta un
+    bloqueo o las páginas tardan en cargar, y baja de nuevo tras una racha de peticiones
+    limpias. Así vamos tan rápido como el sitio tolera en lugar de ir siempre al ritmo
+    del peor caso.
+"""
+import logging
+import multiprocessing
+import random
+import time
+
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DELAYS = {
+    "navigate": 2.0,
+    "load_more": 0.5,
+    "click": 0.5,
+    "scroll": 1.0,
+    "page": 0.5,
+}
+
+# Token cost per action (a full navigation weighs more than a scroll)
+ACTION_COSTS = {"navigate": 2.0}
+
+# Indexes into the shared state array
+_TOKENS, _LAST_REFILL, _MULTIPLIER, _CLEAN_STREAK = range(4)
+
+def pacing_config():
+    return CONFIG["scraping"].get("pacing", {})
+
+class PacingScheduler:
+    """Token bucket with jitter and block-aware multiplicative backoff, shared across processes."""
+
+    def __init__(self, ctx=None):
+        config = pacing_config()
+        ctx = ctx or multiprocessing.get_context()
+        self.rate = float(config.get("rate_per_second", 1.0))
+        self.burst = float(config.get("burst", 3))
+        self.jitter = float(config.get("jitter", 0.5))
+        self.delays = {**DEFAULT_DELAYS, **config.get("delays", {})}
+        self.backoff_factor = float(config.get("backoff_factor", 2.0))
+        self.max_multiplier = float(config.get("max_multiplier", 8.0))
+        self.recover_after = int(config.get("recover_after", 10))
+        self.slow_page_seconds = float(config.get("slow_page_seconds", 6.0))
+
+        self._lock = ctx.Lock()
+        self._state = ctx.Array("d", [self.burst, time.time(), 1.0, 0.0], lock=False)
+
+    @property
+    def multiplier(self):
+        return self._state[_MULTIPLIER]
+
+    def _take_token(self, cost):
+        """Takes `cost` tokens if available. Returns 0, or the seconds to wait before retrying."""
+        with self._lock:
+            now = time.time()
+            # Backoff also slows the refill, so the global rate drops with the multiplier
+            refill = (now - self._state[_LAST_REFILL]) * self.rate / self._state[_MULTIPLIER]
+            self._state[_TOKENS] = min(self.burst, self._state[_TOKENS] + refill)
+            self._state[_LAST_REFILL] = now
+            if self._state[_TOKENS] >= cost:
+                self._state[_TOKENS] -= cost
+                return 0.0
+            return (cost - self._state[_TOKENS]) * self._state[_MULTIPLIER] / self.rate
+
+    def wait(self, action="scroll"):
+        """Blocks for the action's base delay (with jitter and backoff) and a bucket token."""
+        multiplier = self.multiplier
+        base = self.delays.get(action, self.delays["scroll"])
+        delay = base * multiplier * (1.0 + random.uniform(0.0, self.jitter))
+        time.sleep(delay)
+        return delay + self.acquire(action)
+
+    def acquire(self, action="scroll", count=1):
+        """
+        Takes the bucket tokens of `count` actions without the base delay (the in-page
+        scroller waits by itself, and accounts for a whole chunk of scrolls at once).
+        Tokens are taken one action at a time, so `count` may exceed the burst.
+        """
+        cost = ACTION_COSTS.get(action, 1.0)
+        waited = 0.0
+        for _ in range(max(1, int(count))):
+            while True:
+                pending = self._take_token(cost)
+                if not pending:
+                    break
+                time.sleep(pending)
+                waited += pending
+        return waited
+
+    def base_delay(self, action="scroll"):
+        """Current delay for `action` including backoff, without jitter."""
+        return self.delays.get(action, self.delays["scroll"]) * self.multiplier
+
+    def report_block(self):
+        """A block was detected: back off and empty the bucket."""
+        with self._lock:
+            self._state[_MULTIPLIER] = min(self.max_multiplier, self._state[_MULTIPLIER] * self.backoff_factor)
+            self._state[_TOKENS] = 0.0
+            self._state[_CLEAN_STREAK] = 0
+            multiplier = self._state[_MULTIPLIER]
+        logger.warning(f"Pacing: block detected, slowing down (x{multiplier:.1f}).")
+
+    def report_page_time(self, seconds):
+        """Slow pages are an early sign of throttling: back off gently."""
+        if seconds is None or seconds < self.slow_page_seconds:
+            return
+        with self._lock:
+            self._state[_MULTIPLIER] = min(self.max_multiplier, self._state[_MULTIPLIER] * 1.25)
+            self._state[_CLEAN_STREAK] = 0
+            multiplier = self._state[_MULTIPLIER]
+        logger.info(f"Pacing: slow page ({seconds:.1f}s), slowing down (x{multiplier:.1f}).")
+
+    def report_ok(self):
+        """A clean request: after `recover_after` in a row, speed up again."""
+        with self._lock:
+            self._state[_CLEAN_STREAK] += 1
+            if self._state[_CLEAN_STREAK] < self.recover_after or self._state[_MULTIPLIER] <= 1.0:
+                return
+            self._state[_MULTIPLIER] = max(1.0, self._state[_MULTIPLIER] / self.backoff_factor)
+            self._state[_CLEAN_STREAK] = 0
+            multiplier = self._state[_MULTIPLIER]
+        logger.info(f"Pacing: {self.recover_after} clean requests, speeding up (x{multiplier:.1f}).")
+
+_scheduler = None
+
+def install_scheduler(scheduler):
+    """Installs the scheduler used by this process (the pool shares one across workers)."""
+    global _scheduler
+    _scheduler = scheduler
+
+def get_scheduler():
+    global _scheduler
+    if _scheduler is None:
+        _scheduler = PacingScheduler()
+    return _scheduler
+
+def pace(action="scroll"):
+    """Waits until `action` may be performed. Every navigation and scroll goes through here."""
+    return get_scheduler().wait(action)
+
+def acquire(action="scroll", count=1):
+    return get_scheduler().acquire(action, count)
+
+def base_delay(action="scroll"):
+    return get_scheduler().base_delay(action)
+
+def report_block():
+    get_scheduler().report_block()
+
+def report_page_time(seconds):
+    get_scheduler().report_page_time(seconds)
+
+def report_ok():
+    get_scheduler().report_ok()
@@ -0,0 +1,339 @@
+"""
+Fragmentos de JavaScript que se ejecutan dentro de la página de búsqueda de Wallapop.
+
+Se mantienen aparte de `step1_scraper.py` para que el scraper, las herramientas de
+benchmark y los modos alternativos compartan exactamente el mismo código in-page.
+"""
+
+# One result card -> {id, href, title, price, reserved} (null if it has no link yet).
+# Shared by the one-shot extractor and the scroller's incremental harvest.
+CARD_RECORD_FN = """
+function cardRecord(card, titleSel, priceSel, reservedSel) {
+    const href = card.href || card.getAttribute('href') || '';
+    if (!href) return null;
+    const titleElem = card.querySelector(titleSel);
+    const priceElem = card.querySelector(priceSel);
+    const title = titleElem ? titleElem.innerText.trim() : (card.getAttribute('title') || 'No Title');
+    const price = priceElem ? priceElem.innerText.trim() : '0';
+    const text = (card.innerText || '').toLowerCase();
+    return {
+        id: href.split('-').pop(),
+        href: href,
+        title: title,
+        price: price,
+        reserved: !!card.querySelector(reservedSel) || text.includes('reservado')
+    };
+}
+"""
+
+# Known listing ids (tracker), installed in the page by KNOWN_IDS_TEMPLATE as an exact
+# Set: a Bloom filter would be smaller, but a false positive would silently drop a new listing.
+KNOWN_IDS_TEMPLATE = "window.__wsKnown = new Set({ids_json}.split(','));"
+
+# Id of a card from its link, without reading the rest of the card.
+CARD_ID_FN = """
+function cardId(card) {
+    const href = card.href || card.getAttribute('href') || '';
+    return href ? href.split('-').pop() : null;
+}
+"""
+
+# Walks every result card in a single pass and returns them as one JSON string
+# {cards: [...], known: n}. With skipKnown, cards whose id is in window.__wsKnown are
+# only counted. arguments: [cardSelector, titleSelector, priceSelector, reservedSelector, skipKnown]
+CARD_EXTRACTOR_SCRIPT = CARD_RECORD_FN + CARD_ID_FN + """
+const [cardSel, titleSel, priceSel, reservedSel, skipKnown] = arguments;
+const known = skipKnown && window.__wsKnown ? window.__wsKnown : null;
+const records = [];
+let knownCount = 0;
+for (const card of document.querySelectorAll(cardSel)) {
+    if (known && known.has(cardId(card))) {
+        knownCount++;
+        continue;
+    }
+    const record = cardRecord(card, titleSel, priceSel, reservedSel);
+    if (record) records.push(record);
+}
+return JSON.stringify({cards: records, known: knownCount});
+"""
+
+# Cheap progress read for the scroll loop: total card count plus the ids of cards
+# loaded after `startIndex`. arguments: [cardSelector, startIndex]
+CARD_IDS_SCRIPT = """
+const [cardSel, startIndex] = arguments;
+const cards = document.querySelectorAll(cardSel);
+const ids = [];
+for (let i = startIndex; i < cards.length; i++) {
+    const href = cards[i].href || cards[i].getAttribute('href') || '';
+    if (href) ids.push(href.split('-').pop());
+}
+return {count: cards.length, ids: ids};
+"""
+
+# Finds the "Cargar más" button, even inside the walla-button Shadow DOM.
+# Shared by LOAD_MORE_SCRIPT and PAGE_PROBE_SCRIPT.
+LOAD_MORE_FINDER = """
+function findLoadMore() {
+    // Target class from logs
+    const targetClass = 'walla-button__button walla-button__button--medium walla-button__button--primary';
+
+    const candidates = document.querySelectorAll('walla-button');
+    for (const host of candidates) {
+        // Priority 1: Check host text
+        if (host.innerText && (host.innerText.toLowerCase().includes('cargar más') || host.innerText.toLowerCase().includes('ver más') || host.innerText.toLowerCase().includes('load'))) {
+            return host;
+        }
+
+        // Check in Shadow DOM
+        if (host.shadowRoot) {
+            // Priority 2: Check by specific Class inside Shadow DOM
+            const classBtn = host.shadowRoot.querySelector(`button[class='${targetClass}']`);
+            if (classBtn) return classBtn;
+
+            // Priority 3: Check by text inside Shadow DOM (fallback)
+            const innerBtn = host.shadowRoot.querySelector('button');
+            if (innerBtn) {
+                const txt = innerBtn.innerText || innerBtn.textContent;
+                if (txt && (txt.toLowerCase().includes('cargar') || txt.toLowerCase().includes('ver más') || txt.toLowerCase().includes('load'))) {
+                    return innerBtn;
+                }
+            }
+        }
+    }
+    return null;
+}
+"""
+
+# Returns the "Cargar más" element (or null). No arguments.
+LOAD_MORE_SCRIPT = LOAD_MORE_FINDER + """
+return findLoadMore();
+"""
+
+# Block check plus scroll progress in one round-trip, without pulling page_source.
+# Same markers as the old title/page_source check: CloudFront error title or
+# "Request blocked" in the document. arguments: [cardSelector, startIndex]
+PAGE_PROBE_SCRIPT = LOAD_MORE_FINDER + """
+const [cardSel, startIndex] = arguments;
+const title = document.title || '';
+let marker = null;
+if (title.includes('ERROR')) marker = 'title:ERROR';
+else if (title.includes('The request could not be satisfied')) marker = 'title:request could not be satisfied';
+else if (document.documentElement && document.documentElement.textContent.includes('Request blocked')) marker = 'body:Request blocked';
+const cards = document.querySelectorAll(cardSel);
+const ids = [];
+for (let i = startIndex; i < cards.length; i++) {
+    const href = cards[i].href || cards[i].getAttribute('href') || '';
+    if (href) ids.push(href.split('-').pop());
+}
+return {title: title, blocked: marker !== null, marker: marker, count: cards.length, ids: ids, loadMore: findLoadMore() !== null};
+"""
+
+# Autonomous in-page scroller, kept in window.__wsScroller (reset on every navigation).
+# Each step scrolls to the bottom, clicks "Cargar más" if the MutationObserver has seen it
+# appear, and waits for the DOM to report the next batch (or `batchTimeoutMs`), instead of
+# sleeping a fixed time. Stops by itself after `staleLimit` steps without new cards, at
+# `target` cards or at `maxScrolls`. `run(until)` returns a promise, so the scroller can be
+# driven in chunks (SCROLLER_RUN_SCRIPT) or started in the background and polled
+# (SCROLLER_START_SCRIPT / SCROLLER_STATUS_SCRIPT / SCROLLER_POLL_SCRIPT), e.g. one per window.
+# With `opts.harvest`, cards are read as soon as each batch loads and (with `prune`)
+# emptied, so deep scrolls keep memory flat; HARVEST_COLLECT_SCRIPT returns them.
+SCROLLER_INSTALL = LOAD_MORE_FINDER + CARD_RECORD_FN + CARD_ID_FN + """
+function installScroller(cardSel, opts) {
+    // Already running on this page: only refresh the options (e.g. pacing gap after a backoff)
+    if (window.__wsScroller) {
+        Object.assign(window.__wsScroller.opts, opts);
+        return window.__wsScroller;
+    }
+    const s = {
+        steps: 0, attempts: 0, scrolls: 0, count: document.querySelectorAll(cardSel).length, stale: 0, clicks: 0,
+        done: false, reason: null, running: false, error: null, ids: [], reported: 0,
+        button: findLoadMore(), buttonHostSeen: false, current: null, opts: opts,
+        records: [], seen: new Set(), known: 0, pruned: 0
+    };
+    const sleep = (ms) => new Promise(r => setTimeout(r, ms));
+
+    // "Cargar más" shows up once: watch for its host instead of searching on every step
+    s.observer = new MutationObserver((mutations) => {
+        if (s.button) return;
+        for (const m of mutations) {
+            for (const node of m.addedNodes) {
+                if (node.nodeType === 1 && (node.tagName === 'WALLA-BUTTON' || node.querySelector('walla-button'))) {
+                    s.buttonHostSeen = true;
+                    s.button = findLoadMore();
+                    return;
+                }
+            }
+        }
+    });
+    s.observer.observe(document.body, {childList: true, subtree: true});
+
+    // Incremental harvest: read new cards right after they load and, with `prune`, empty
+    // them so their images, text and listeners can be freed. The emptied <a> stays in
+    // place (React keeps its list intact) and keeps its href, so counts and ids still work.
+    s.harvest = () => {
+        const h = s.opts.harvest;
+        if (!h) return 0;
+        let harvested = 0;
+        for (const card of document.querySelectorAll(cardSel)) {
+            if (card.hasAttribute('data-ws-harvested')) continue;
+            const id = cardId(card);
+            if (!id) continue;
+            if (!s.seen.has(id)) {
+                s.seen.add(id);
+                // Known listings (skipKnown) are only counted
+                if (h.skipKnown && window.__wsKnown && window.__wsKnown.has(id)) s.known++;
+                else s.records.push(cardRecord(card, h.titleSel, h.priceSel, h.reservedSel));
+            }
+            card.setAttribute('data-ws-harvested', '1');
+            if (h.prune) {
+                card.replaceChildren();
+                s.pruned++;
+            }
+            harvested++;
+        }
+        return harvested;
+    };
+
+    const waitingForButton = () => s.clicks < s.opts.maxClicks;
+
+    // Resolves with the card count once it grew (or the button showed up) and the DOM
+    // settled, or on timeout
+    const waitForBatch = (prev) => new Promise(resolve => {
+        let settleTimer = null;
+        const finish = () => {
+            observer.disconnect();
+            clearTimeout(settleTimer);
+            clearTimeout(timeout);
+            resolve(document.querySelectorAll(cardSel).length);
+        };
+        const observer = new MutationObserver(() => {
+            clearTimeout(settleTimer);
+            settleTimer = setTimeout(() => {
+                if (document.querySelectorAll(cardSel).length > prev || (waitingForButton() && s.button)) finish();
+            }, s.opts.settleMs);
+        });
+        const timeout = setTimeout(finish, s.opts.batchTimeoutMs);
+        observer.observe(document.body, {childList: true, subtree: true});
+    });
+
+    const step = async () => {
+        const started = performance.now();
+        const prev = s.count;
+        // The custom element may upgrade after insertion: retry the lookup once it was seen
+        if (!s.button && s.buttonHostSeen) s.button = findLoadMore();
+        if (s.button && s.button.isConnected && s.clicks < s.opts.maxClicks) {
+            s.button.scrollIntoView();
+            s.button.click();
+            s.clicks++;
+            s.button = null;
+        }
+        const searching = waitingForButton();
+        window.scrollTo(0, document.body.scrollHeight);
+        s.steps++;
+        if (searching) s.attempts++;
+        else s.scrolls++;
+        const count = await waitForBatch(prev);
+        const cards = document.querySelectorAll(cardSel);
+        for (let i = prev; i < cards.length; i++) {
+            const href = cards[i].href || cards[i].getAttribute('href') || '';
+            if (href) s.ids.push(href.split('-').pop());
+        }
+        s.count = count;
+        s.harvest();
+        // Until "Cargar más" is clicked the feed does not grow: those steps only count
+        // as button attempts, not against the scroll budget or the stale limit
+        if (searching) {
+            if (waitingForButton() && s.attempts >= s.opts.buttonAttempts) s.stop('no_button');
+        } else {
+            s.stale = count > prev ? 0 : s.stale + 1;
+            if (s.stale >= s.opts.staleLimit) s.stop('stale');
+            else if (s.opts.target && count >= s.opts.target) s.stop('target');
+            else if (s.scrolls >= s.opts.maxScrolls) s.stop('max_scrolls');
+        }
+        // Politeness: never scroll faster than the pacing gap (with jitter)
+        const gap = s.opts.minGapMs * (1 + Math.random() * s.opts.jitter);
+        const elapsed = performance.now() - started;
+        if (!s.done && elapsed < gap) await sleep(gap - elapsed);
+    };
+
+    s.run = (until) => {
+        if (s.running) return s.current;
+        s.running = true;
+        s.current = (async () => {
+            try {
+                while (!s.done && s.steps < until) await step();
+            } catch (e) {
+                s.error = String(e);
+                s.stop('error');
+            } finally {
+                s.running = false;
+            }
+        })();
+        return s.current;
+    };
+    s.stop = (reason) => {
+        if (s.done) return;
+        s.done = true;
+        s.reason = reason;
+        s.observer.disconnect();
+    };
+    // Progress since the previous report (ids are only sent once)
+    s.report = () => {
+        const ids = s.ids.slice(s.reported);
+        s.reported = s.ids.length;
+        return {steps: s.steps, attempts: s.attempts, scrolls: s.scrolls, count: s.count, stale: s.stale, clicks: s.clicks, done: s.done,
+                reason: s.reason, running: s.running, error: s.error, ids: ids,
+                harvested: s.records.length, known: s.known, pruned: s.pruned};
+    };
+    window.__wsScroller = s;
+    return s;
+}
+"""
+
+# Runs up to `chunk` more scroller steps and reports (execute_async_script).
+# arguments: [cardSelector, options, chunk, callback]
+SCROLLER_RUN_SCRIPT = SCROLLER_INSTALL + """
+const [cardSel, opts, chunk] = arguments;
+const callback = arguments[arguments.length - 1];
+const s = installScroller(cardSel, opts);
+s.run(s.steps + chunk).then(() => callback(s.report()));
+"""
+
+# Starts the scroller in the background and returns at once: up to `chunk` more steps,
+# or until it stops by itself if no chunk is given. arguments: [cardSelector, options, chunk?]
+SCROLLER_START_SCRIPT = SCROLLER_INSTALL + """
+const [cardSel, opts, chunk] = arguments;
+const s = installScroller(cardSel, opts);
+s.run(chunk ? s.steps + chunk : Infinity);
+return s.report();
+"""
+
+# State of the scroller without consuming its progress: {running, done, error}, or null if
+# none was started on this page. Cheap to call while a chunk is still running.
+SCROLLER_STATUS_SCRIPT = """
+const s = window.__wsScroller;
+return s ? {running: s.running, done: s.done, error: s.error} : null;
+"""
+
+# Progress of a running scroller (null if none was started on this page).
+# Consumes the new ids: call it once per finished chunk.
+SCROLLER_POLL_SCRIPT = """
+const s = window.__wsScroller;
+return s ? s.report() : null;
+"""
+
+# Stops the scroller after its current step. arguments: [reason]
+SCROLLER_STOP_SCRIPT = """
+const s = window.__wsScroller;
+if (s) s.stop(arguments[0]);
+return s ? s.report() : null;
+"""
+
+# Harvests what is left and returns every harvested card as one JSON string
+# {cards: [...], known: n} (null if the scroller did not harvest on this page).
+HARVEST_COLLECT_SCRIPT = """
+const s = window.__wsScroller;
+if (!s || !s.opts.harvest) return null;
+s.harvest();
+return JSON.stringify({cards: s.records, known: s.known});
+"""
@@ -0,0 +1,88 @@
+"""
+Partición por franjas de precio para el Step 1.
+
+Las búsquedas populares ("iphone 16") tienen muchos más anuncios de los que caben en
+`scrolls` scrolls, y el resultado se trunca sin avisar. Con `price_partition.enabled`,
+cada search item se divide en franjas de precio (desde `precio_min` hasta `precio_max`
+o `max_price`, más una franja abierta por arriba), que se consultan por separado con
+`min_sale_price` / `max_sale_price`. Si una franja agota el presupuesto de scroll
+(`scroll_stop.reason == "max_scrolls"`), se parte en dos y se vuelven a encolar sus
+mitades. Los duplicados entre franjas los elimina `merge_listings` al cerrar la ejecución.
+"""
+import logging
+
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Stop reasons meaning the query had more results than the scroll/page budget
+OVERFLOW_REASONS = {"max_scrolls", "max_pages"}
+
+def partition_config():
+    return CONFIG["scraping"].get("price_partition", {})
+
+def is_enabled():
+    return bool(partition_config().get("enabled", False))
+
+def band_item(item_config, low, high):
+    """Copy of the item restricted to prices in [low, high] (high=None: no upper bound)."""
+    return {**item_config, "filters": {**item_config["filters"], "price_band": [low, high]}}
+
+def initial_bands(item_config):
+    """Equal-width bands from precio_min to precio_max (or max_price), plus an open top band."""
+    config = partition_config()
+    filters = item_config["filters"]
+    low = int(filters.get("precio_min") or 0)
+    high = int(filters.get("precio_max") or config.get("max_price", 2000))
+    n_bands = max(1, int(config.get("bands", 4)))
+    if high <= low:
+        return [(low, filters.get("precio_max"))]
+
+    width = (high - low) / n_bands
+    edges = [low + round(i * width) for i in range(n_bands)] + [high]
+    bands = list(zip(edges[:-1], edges[1:]))
+    if not filters.get("precio_max"):
+        bands.append((high, None))
+    return bands
+
+def expand_price_bands(search_items):
+    """Splits every search item into its initial price bands."""
+    queries = []
+    for item in search_items:
+        if "price_band" in item["filters"]:
+            queries.append(item)
+            continue
+        bands = initial_bands(item)
+        logger.info(f"Partitioning '{item['name']}' into {len(bands)} price bands.")
+        queries.extend(band_item(item, low, high) for low, high in bands)
+    return queries
+
+def split_band(item_config):
+    """Two halves of the item's band, or [] if it is already as narrow as allowed."""
+    low, high = item_config["filters"]["price_band"]
+    min_width = partition_config().get("min_band_width", 10)
+    if high is None:
+        # Open top band: double the lower bound, keep the rest open
+        middle = max(low * 2, low + min_width)
+        return [band_item(item_config, low, middle), band_item(item_config, middle, None)]
+    if high - low < 2 * min_width:
+        return []
+    middle = low + (high - low) // 2
+    return [band_item(item_config, low, middle), band_item(item_config, middle, high)]
+
+def follow_up_items(item_config, df):
+    """Sub-bands to scrape when `df` (the item's result) hit the scroll budget."""
+    stop = df.attrs.get("scroll_stop", {})
+    if "price_band" not in item_config["filters"] or stop.get("reason") not in OVERFLOW_REASONS:
+        return []
+    children = split_band(item_config)
+    band = format_band(item_config["filters"]["price_band"])
+    if children:
+        logger.info(f"'{item_config['name']}' {band} overflowed the scroll budget: splitting into {len(children)} bands.")
+    else:
+        logger.warning(f"'{item_config['name']}' {band} overflowed but is too narrow to split: results truncated.")
+    return children
+
+def format_band(band):
+    low, high = band
+    return f"[{low}-{high}€]" if high is not None else f"[{low}€+]"
@@ -0,0 +1,157 @@
+"""
+Política de recursos vía Chrome DevTools Protocol (CDP) para el Step 1.
+
+Bloquea, a nivel de red, lo que el scraper nunca usa (miniaturas, vídeo, fuentes,
+analítica y anuncios) y deja pasar todo lo que necesita la rejilla de resultados
+(HTML, JS/CSS de la app y el JSON de búsqueda). Los tipos se bloquean por extensión
+y los trackers por dominio, con `Network.setBlockedURLs`.
+
+Con `report` activado, se leen los logs de rendimiento de Chrome para informar por
+búsqueda de los bytes transferidos, las peticiones bloqueadas y el tiempo de carga.
+Una petición bloqueada no llega a descargarse, así que el ahorro en bytes se mide
+comparando con una ejecución con `enabled: false` y `report: true`.
+
+`renderer_memory` lee además el heap JS y el número de nodos DOM de la pestaña
+(`Performance.getMetrics`), para seguir el consumo de memoria en scrolls profundos.
+"""
+import json
+import logging
+from collections import Counter
+
+from .config import CONFIG
+
+logger = logging.getLogger(__name__)
+
+TYPE_PATTERNS = {
+    "image": ["*.jpg*", "*.jpeg*", "*.png*", "*.gif*", "*.webp*", "*.avif*", "*.svg*", "*.ico*"],
+    "media": ["*.mp4*", "*.webm*", "*.m3u8*", "*.mp3*", "*.ogg*"],
+    "font": ["*.woff*", "*.woff2*", "*.ttf*", "*.otf*", "*.eot*"],
+}
+
+DEFAULT_TRACKER_PATTERNS = [
+    "*google-analytics.com*",
+    "*googletagmanager.com*",
+    "*doubleclick.net*",
+    "*googlesyndication.com*",
+    "*googleadservices.com*",
+    "*amazon-adsystem.com*",
+    "*adnxs.com*",
+    "*criteo.com*",
+    "*criteo.net*",
+    "*taboola.com*",
+    "*facebook.net*",
+    "*connect.facebook.com*",
+    "*hotjar.com*",
+    "*bat.bing.com*",
+    "*analytics.tiktok.com*",
+]
+
+def policy_config():
+    return CONFIG["scraping"].get("resource_policy", {})
+
+def is_enabled():
+    return bool(policy_config().get("enabled", False))
+
+def report_enabled():
+    # Independent of `enabled`, so a run with blocking off gives the baseline to compare against
+    return bool(policy_config().get("report", False))
+
+def blocked_patterns():
+    config = policy_config()
+    patterns = []
+    for resource_type in config.get("block_types", ["image", "media", "font"]):
+        patterns.extend(TYPE_PATTERNS.get(resource_type, []))
+    patterns.extend(config.get("block_patterns", DEFAULT_TRACKER_PATTERNS))
+    return patterns
+
+def enable_network_logging(options):
+    """Adds the capability needed to read CDP network events from the performance log."""
+    options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+
+def apply_resource_policy(driver):
+    """Installs the blocked URL list on the current tab."""
+    if not is_enabled():
+        return
+    try:
+        patterns = blocked_patterns()
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": patterns})
+        logger.info(f"Resource policy active: {len(patterns)} blocked URL patterns.")
+    except Exception as e:
+        logger.warning(f"Could not apply resource policy via CDP: {e}")
+
+def drain_network_events(driver):
+    """Reads (and clears) pending CDP Network.* events from the performance log."""
+    try:
+        entries = driver.get_log("performance")
+    except Exception as e:
+        logger.debug(f"Performance log not available: {e}")
+        return []
+
+    events = []
+    for entry in entries:
+        try:
+            message = json.loads(entry["message"])["message"]
+        except (KeyError, ValueError):
+            continue
+        if message.get("method", "").startswith("Network."):
+            events.append(message)
+    return events
+
+def summarize_network_events(events):
+    """Transferred bytes, request count and blocked requests (by type) from CDP events."""
+    types = {}
+    transferred = 0
+    requests = 0
+    blocked = Counter()
+    for event in events:
+        method = event["method"]
+        params = event.get("params", {})
+        if method == "Network.requestWillBeSent":
+            requests += 1
+            types[params.get("requestId")] = params.get("type", "Other")
+        elif method == "Network.loadingFinished":
+            transferred += params.get("encodedDataLength", 0)
+        elif method == "Network.loadingFailed" and params.get("blockedReason"):
+            blocked[types.get(params.get("requestId"), params.get("type", "Other"))] += 1
+    return {"bytes": transferred, "requests": requests, "blocked": dict(blocked)}
+
+def page_load_seconds(driver):
+    """Load time of the current document from the Navigation Timing API."""
+    try:
+        return driver.execute_script(
+            "const n = performance.getEntriesByType('navigation')[0];"
+            "return n ? (n.loadEventEnd || n.domContentLoadedEventEnd) / 1000 : null;"
+        )
+    except Exception:
+        return None
+
+def renderer_memory(driver):
+    """JS heap in use (MB) and DOM node count of the current tab, via CDP Performance.getMetrics."""
+    try:
+        driver.execute_cdp_cmd("Performance.enable", {})
+        metrics = driver.execute_cdp_cmd("Performance.getMetrics", {})["metrics"]
+    except Exception as e:
+        logger.debug(f"Renderer metrics not available: {e}")
+        return None
+    values = {m["name"]: m["value"] for m in metrics}
+    return {
+        "js_heap_mb": values.get("JSHeapUsedSize", 0) / 1_048_576,
+        "dom_nodes": int(values.get("Nodes", 0)),
+    }
+
+def log_resource_report(driver, item_config, load_seconds=None, events=None):
+    """Logs bytes transferred, blocked requests and page-load time for one search."""
+    if not report_enabled():
+        return None
+    events = events if events is not None else drain_network_events(driver)
+    stats = summarize_network_events(events)
+    stats["load_seconds"] = load_seconds
+    blocked_total = sum(stats["blocked"].values())
+    blocked_detail = ", ".join(f"{t}: {n}" for t, n in sorted(stats["blocked"].items())) or "none"
+    load_text = f"{load_seconds:.2f}s" if load_seconds is not None else "n/a"
+    logger.info(
+        f"Resources for '{item_config['name']}': {stats['bytes'] / 1_048_576:.2f} MB transferred "
+        f"in {stats['requests']} requests, {blocked_total} blocked ({blocked_detail}), page load {load_text}"
+    )
+    return stats
@@ -0,0 +1,107 @@
+"""
+Caché de resultados del Step 1 con TTL.
+
+Varias búsquedas (o varias configs en la misma ventana del cron, o el reintento de
+`run_step` tras un fallo posterior) pueden resolver a la misma query. Cada resultado
+se guarda con la URL de búsqueda normalizada como clave (parámetros ordenados, keywords
+en minúsculas) y, dentro de `scraping.result_cache.ttl_minutes`, se sirve desde disco en
+lugar de volver a scrapear. Los ficheros viven junto al resto de cachés
+(`warm_start.cache_dir()/results`), fuera de `data/`.
+"""
+import hashlib
+import json
+import logging
+import os
+import time
+from datetime import datetime
+from urllib.parse import urlencode, quote
+
+from .config import CONFIG
+from . import warm_start
+
+logger = logging.getLogger(__name__)
+
+_stats = {"hits": 0, "misses": 0}
+
+def cache_config():
+    return CONFIG["scraping"].get("result_cache", {})
+
+def is_enabled():
+    return bool(cache_config().get("enabled", False))
+
+def normalized_url(item_config):
+    """Search URL with sorted params and normalized keywords: equal queries, equal key."""
+    # Imported here to avoid a circular import (step1_scraper uses this cache)
+    from .step1_scraper import SEARCH_URL, build_search_params, skip_known_enabled
+
+    params = []
+    for key, value in build_search_params(item_config):
+        if key == "keywords":
+            value = " ".join(value.lower().split())
+        params.append((key, value))
+    # Results without known listings are a different result set
+    if skip_known_enabled():
+        params.append(("skip_known", "1"))
+    return f"{SEARCH_URL}?{urlencode(sorted(params), quote_via=quote)}"
+
+def _path(url):
+    digest = hashlib.sha1(url.encode("utf-8")).hexdigest()
+    return warm_start.cache_dir() / "results" / f"{digest}.json"
+
+def _log(outcome, item_config):
+    _stats[outcome] += 1
+    logger.info(
+        f"Result cache {'hit' if outcome == 'hits' else 'miss'} for '{item_config['name']}' "
+        f"({_stats['hits']} hits / {_stats['misses']} misses)"
+    )
+
+def get(item_config):
+    """Cached DataFrame for this query if younger than the TTL, else None."""
+    if not is_enabled():
+        return None
+    from .step1_scraper import cards_to_dataframe
+
+    url = normalized_url(item_config)
+    path = _path(url)
+    ttl = cache_config().get("ttl_minutes", 60) * 60
+    try:
+        if not path.exists() or time.time() - path.stat().st_mtime > ttl:
+            _log("misses", item_config)
+            return None
+        with open(path, "r", encoding="utf-8") as f:
+            entry = json.load(f)
+    except Exception as e:
+        logger.warning(f"Ignoring unreadable result cache entry {path.name}: {e}")
+        _log("misses", item_config)
+        return None
+
+    _log("hits", item_config)
+    stored_at = datetime.strptime(entry["stored_at"], "%Y-%m-%d %H:%M:%S")
+    df = cards_to_dataframe(entry["cards"], item_config, time_scrap=stored_at)
+    df.attrs["scroll_stop"] = entry.get("scroll_stop", {})
+    return df
+
+def put(item_config, df):
+    """Stores the listings of a finished query."""
+    if not is_enabled():
+        return
+    url = normalized_url(item_config)
+    path = _path(url)
+    entry = {
+        "url": url,
+        "stored_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "scroll_stop": df.attrs.get("scroll_stop", {}),
+        "cards": [
+            {"id": row.id, "href": row.url_articulo, "title": row.nombre, "price": row.precio, "reserved": bool(row.reservado)}
+            for row in df.itertuples(index=False)
+        ],
+    }
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        # Pool workers may write concurrently: write aside, then rename
+        tmp_path = path.with_suffix(f".{os.getpid()}.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.warning(f"Could not write result cache entry: {e}")
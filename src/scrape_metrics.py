@@ -0,0 +1,124 @@
+"""
+Métricas estructuradas del Step 1: un registro JSON por search item.
+
+Cada registro incluye la duración de cada fase (navegación, cookies, "Cargar más",
+scroll, comprobaciones de bloqueo, extracción...), el número de tarjetas, los comandos
+WebDriver enviados por tipo (número y tiempo, ver `webdriver_tracer`) y las
+comprobaciones de bloqueo. Se añaden a
+`scrapping_outputs/scraper_metrics.jsonl` (junto al log del orquestador) para poder
+comparar ejecuciones y detectar regresiones.
+"""
+import json
+import logging
+import os
+import time
+from collections import defaultdict
+from datetime import datetime
+
+from .config import LOG_DIR
+from . import webdriver_tracer
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = LOG_DIR / "scraper_metrics.jsonl"
+
+_run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+
+def set_run_id(run_id):
+    """Tags every following record with this run (set before forking pool workers)."""
+    global _run_id
+    _run_id = run_id
+
+class ScrapeMetrics:
+    """
+    Phase timer for one search item.
+    `lap(name)` closes the current phase; `timed(name)` measures a nested section
+    (e.g. block checks inside the scroll loop) and excludes it from the enclosing lap.
+    """
+
+    def __init__(self, item_config, backend="selenium", driver=None):
+        self.driver = driver
+        self.record = {
+            "run_id": _run_id,
+            "pid": os.getpid(),
+            "search_term": item_config["name"],
+            "municipio": item_config["filters"].get("municipio"),
+            "backend": backend,
+            "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            "phases": defaultdict(float),
+            "counts": defaultdict(int),
+        }
+        self._start = time.perf_counter()
+        self._last_lap = self._start
+        self._nested = 0.0
+        self._commands_at_start = webdriver_tracer.command_count(driver)
+        self._command_stats_at_start = webdriver_tracer.command_stats(driver)
+
+    def lap(self, phase):
+        now = time.perf_counter()
+        self.record["phases"][phase] += now - self._last_lap - self._nested
+        self._last_lap = now
+        self._nested = 0.0
+
+    def timed(self, phase):
+        return _NestedTimer(self, phase)
+
+    def count(self, key, n=1):
+        self.record["counts"][key] += n
+
+    def set(self, key, value):
+        self.record[key] = value
+
+    def finish(self, status="ok", error=None):
+        """Closes the record and appends it to the JSONL metrics file."""
+        self.record["status"] = status
+        if error:
+            self.record["error"] = str(error)
+        self.record["total_seconds"] = time.perf_counter() - self._start
+        self.record["counts"]["webdriver_commands"] = webdriver_tracer.command_count(self.driver) - self._commands_at_start
+        self.record["webdriver"] = webdriver_tracer.stats_since(self.driver, self._command_stats_at_start)
+        self.record["phases"] = {k: round(v, 3) for k, v in self.record["phases"].items()}
+        self.record["counts"] = dict(self.record["counts"])
+        self.record["total_seconds"] = round(self.record["total_seconds"], 3)
+
+        try:
+            METRICS_PATH.parent.mkdir(parents=True, exist_ok=True)
+            # One short line per append: safe enough with several pool workers writing
+            with open(METRICS_PATH, "a", encoding="utf-8") as f:
+                f.write(json.dumps(self.record, ensure_ascii=False) + "\n")
+        except Exception as e:
+            logger.warning(f"Could not write scraper metrics: {e}")
+
+        phases = ", ".join(f"{k}={v:.1f}s" for k, v in self.record["phases"].items())
+        logger.info(f"Timing for '{self.record['search_term']}' ({self.record['municipio']}): total={self.record['total_seconds']:.1f}s [{phases}]")
+        self.log_webdriver_histogram()
+        return self.record
+
+    def log_webdriver_histogram(self):
+        """Round-trip budget: WebDriver commands by type, and their share of the item's time."""
+        stats = self.record.get("webdriver")
+        if not stats:
+            return
+        total = self.record["total_seconds"]
+        webdriver_seconds = sum(s["seconds"] for s in stats.values())
+        share = 100 * webdriver_seconds / total if total else 0
+        logger.info(
+            f"WebDriver commands for '{self.record['search_term']}': {self.record['counts']['webdriver_commands']} commands, "
+            f"{webdriver_seconds:.1f}s of {total:.1f}s ({share:.0f}%)\n"
+            + webdriver_tracer.format_histogram(stats, total)
+        )
+
+class _NestedTimer:
+    def __init__(self, metrics, phase):
+        self.metrics = metrics
+        self.phase = phase
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        elapsed = time.perf_counter() - self._start
+        self.metrics.record["phases"][self.phase] += elapsed
+        self.metrics._nested += elapsed
+        return False
@@ -0,0 +1,171 @@
+"""
+Pool de navegadores para el Step 1.
+
+Lanza N procesos worker, cada uno con su propio Chrome (perfil aislado y User-Agent
+aleatorio), que se reparten los `search_items` desde una cola común. Todos comparten
+un `PacingScheduler` (token bucket + backoff) para que el ritmo global de peticiones
+no crezca con N y un bloqueo en un worker frene a todos.
+"""
+import logging
+import multiprocessing
+import queue
+import shutil
+import tempfile
+
+from . import pacing
+
+logger = logging.getLogger(__name__)
+
+def _worker_main(worker_idx, task_queue, result_queue, scheduler, startup_lock, stop_event):
+    """Worker process: one driver, many search items."""
+    # Imported here so the parent does not need Selenium state before forking
+    from .step1_scraper import setup_driver, scrape_item, item_label
+    from . import warm_start, tab_pool
+
+    pacing.install_scheduler(scheduler)
+    if warm_start.is_enabled():
+        # Persistent per-worker profile (keeps cookie consent between runs)
+        profile_dir = str(warm_start.profile_dir(worker_idx))
+        temp_profile = False
+    else:
+        profile_dir = tempfile.mkdtemp(prefix=f"wallascrap_w{worker_idx}_")
+        temp_profile = True
+    driver = None
+    try:
+        # Serialize driver start-up: undetected_chromedriver patches a shared binary
+        with startup_lock:
+            driver = setup_driver(profile_dir=profile_dir)
+
+        if tab_pool.tabs_per_browser() > 1:
+            _run_worker_tabs(worker_idx, driver, task_queue, result_queue, stop_event)
+        else:
+            while not stop_event.is_set():
+                task = task_queue.get()
+                if task is None:
+                    break
+                idx, item = task
+                logger.info(f"[worker {worker_idx}] Scraping item: {item_label(item)}")
+                try:
+                    df = scrape_item(driver, item)
+                    result_queue.put((idx, df, None))
+                except Exception as e:
+                    logger.error(f"[worker {worker_idx}] Error scraping {item_label(item)}: {e}")
+                    result_queue.put((idx, None, str(e)))
+    except Exception as e:
+        logger.error(f"[worker {worker_idx}] Worker crashed: {e}")
+    finally:
+        if driver is not None:
+            try:
+                driver.quit()
+            except Exception:
+                pass
+        if temp_profile:
+            shutil.rmtree(profile_dir, ignore_errors=True)
+
+def _run_worker_tabs(worker_idx, driver, task_queue, result_queue, stop_event):
+    """Worker loop with `tabs_per_browser` items in flight (see `tab_pool`)."""
+    from .step1_scraper import item_label
+    from . import tab_pool
+
+    finished = False
+
+    def next_task(block):
+        # Only wait for the queue when every window is idle; the None sentinel ends the worker
+        nonlocal finished
+        if finished or stop_event.is_set():
+            return None
+        try:
+            task = task_queue.get() if block else task_queue.get_nowait()
+        except queue.Empty:
+            return None
+        finished = task is None
+        return task
+
+    def on_error(idx, item, e):
+        logger.error(f"[worker {worker_idx}] Error scraping {item_label(item)}: {e}")
+        result_queue.put((idx, None, str(e)))
+
+    tab_pool.run_tabs(
+        driver,
+        next_task,
+        on_done=lambda idx, item, df: result_queue.put((idx, df, None)),
+        on_error=on_error,
+    )
+
+def run_pool(items, workers, on_result=None):
+    """
+    Scrapes `items` with `workers` parallel browsers.
+    Returns the list of DataFrames in the same order as `items` (follow-up items last).
+    `on_result(item, df)` is called in the parent as soon as each item finishes; it may
+    return more items to scrape (e.g. price sub-bands), which are enqueued right away.
+    Fails fast: the first item error stops the pool and is re-raised.
+    """
+    items = list(items)
+    # fork: workers inherit the orchestrator's logging handlers (Linux only, like the rest of the project)
+    ctx = multiprocessing.get_context("fork")
+    scheduler = pacing.PacingScheduler(ctx=ctx)
+
+    task_queue = ctx.Queue()
+    result_queue = ctx.Queue()
+    startup_lock = ctx.Lock()
+    stop_event = ctx.Event()
+
+    for idx, item in enumerate(items):
+        task_queue.put((idx, item))
+
+    procs = [
+        ctx.Process(
+            target=_worker_main,
+            args=(i, task_queue, result_queue, scheduler, startup_lock, stop_event),
+            daemon=False,
+        )
+        for i in range(workers)
+    ]
+    logger.info(f"Starting browser pool with {workers} workers for {len(items)} search items...")
+    for p in procs:
+        p.start()
+
+    results = [None] * len(items)
+    pending = len(items)
+    error = None
+    try:
+        while pending:
+            try:
+                idx, df, err = result_queue.get(timeout=5)
+            except queue.Empty:
+                if not any(p.is_alive() for p in procs):
+                    error = f"All pool workers exited with {pending} items pending."
+                    break
+                continue
+
+            pending -= 1
+            if err is not None:
+                error = f"Error scraping {items[idx]['name']} ({items[idx]['filters'].get('municipio')}): {err}"
+                break
+
+            results[idx] = df
+            follow_ups = on_result(items[idx], df) if on_result is not None else None
+            for item in follow_ups or []:
+                task_queue.put((len(items), item))
+                items.append(item)
+                results.append(None)
+                pending += 1
+    finally:
+        # Sentinels go last: items may be enqueued until the final result arrives
+        for _ in range(workers):
+            task_queue.put(None)
+        if error is not None:
+            stop_event.set()
+            # Keep draining so workers are not blocked flushing results into a full pipe
+            while any(p.is_alive() for p in procs):
+                try:
+                    result_queue.get(timeout=1)
+                except queue.Empty:
+                    pass
+        for p in procs:
+            p.join()
+
+    if error is not None:
+        raise Exception(error)
+
+    return results
@@ -0,0 +1,128 @@
+"""
+Parser offline de snapshots HTML de resultados de búsqueda (Step 1 sin navegador).
+
+Lee los `page_source` guardados (`web-<slug>@<ciudad>~<franja>-<timestamp>.html`, ver
+`save_snapshot` y `snapshot_stem`) y produce exactamente el mismo DataFrame que
+`scrape_item`: la ciudad y la franja de precio del nombre vuelven al `item_config`, así
+que las consultas repartidas por ciudad o franja se reproducen cada una con la suya.
+Permite:
+- `--replay <dir>`: ejecutar todo el pipeline a partir de snapshots, sin Chrome.
+- Re-aplicar filtros/enriquecimiento sobre páginas históricas a velocidad de parseo.
+- Comparar parsers sin navegador (`tools/bench_snapshot_parsers.py`).
+"""
+import logging
+import re
+from datetime import datetime
+from pathlib import Path
+from urllib.parse import urljoin
+
+from bs4 import BeautifulSoup
+
+from .config import CONFIG
+from .utils import slugify
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://es.wallapop.com/"
+
+# lxml (a project dependency) is much faster than the stdlib parser, which stays as the
+# fallback if lxml cannot be imported (e.g. no wheel for the platform)
+try:
+    import lxml  # noqa: F401
+    DEFAULT_PARSER = "lxml"
+except ImportError:
+    DEFAULT_PARSER = "html.parser"
+
+# web-<term>[@<city>][~<low>_<high|up>]-<ts>; slugify never produces "@", "~" or "-".
+# Older snapshots only have the term
+SNAPSHOT_NAME_RE = re.compile(
+    r"^web-(?P<slug>[^@~]+?)(?:@(?P<city>[^~]+?))?(?:~(?P<low>\d+)_(?P<high>\d+|up))?-(?P<ts>\d{8}_\d{6})$"
+)
+
+def snapshot_stem(item_config, timestamp_str):
+    """File name (without extension) of a snapshot of this query: term, city and price band."""
+    filters = item_config["filters"]
+    stem = f"web-{slugify(item_config['name'])}"
+    city = filters.get("municipio")
+    if isinstance(city, str):
+        stem += f"@{slugify(city)}"
+    band = filters.get("price_band")
+    if band:
+        stem += f"~{band[0]}_{band[1] if band[1] is not None else 'up'}"
+    return f"{stem}-{timestamp_str}"
+
+def parse_cards(html, parser=None):
+    """Returns raw card records (same shape as `extract_cards`) from a page source."""
+    # Imported here to avoid a circular import with step1_scraper
+    from .step1_scraper import CARD_SELECTOR, TITLE_SELECTOR, PRICE_SELECTOR, RESERVED_SELECTOR
+
+    soup = BeautifulSoup(html, parser or DEFAULT_PARSER)
+    cards = []
+    for card in soup.select(CARD_SELECTOR):
+        href = card.get("href")
+        if not href:
+            continue
+        href = urljoin(BASE_URL, href)
+
+        title_elem = card.select_one(TITLE_SELECTOR)
+        price_elem = card.select_one(PRICE_SELECTOR)
+        title = title_elem.get_text(" ", strip=True) if title_elem else (card.get("title") or "No Title")
+        price = price_elem.get_text(" ", strip=True) if price_elem else "0"
+        reserved = card.select_one(RESERVED_SELECTOR) is not None or "reservado" in card.get_text(" ").lower()
+
+        cards.append({
+            "id": href.split("-")[-1],
+            "href": href,
+            "title": title,
+            "price": price,
+            "reserved": reserved,
+        })
+    return cards
+
+def parse_snapshot(path, item_config, parser=None):
+    """Parses one saved HTML file into the step1 DataFrame."""
+    from .step1_scraper import cards_to_dataframe
+
+    path = Path(path)
+    with open(path, "r", encoding="utf-8") as f:
+        html = f.read()
+
+    match = SNAPSHOT_NAME_RE.match(path.stem)
+    if match:
+        time_scrap = datetime.strptime(match.group("ts"), "%Y%m%d_%H%M%S")
+    else:
+        time_scrap = datetime.fromtimestamp(path.stat().st_mtime)
+
+    return cards_to_dataframe(parse_cards(html, parser), item_config, time_scrap=time_scrap)
+
+def match_search_item(path, search_items=None):
+    """
+    The query a snapshot belongs to, from its file name: the configured search item
+    with the snapshot's city and price band in its filters (None if no item matches).
+    """
+    from .step1_scraper import resolve_cities
+
+    search_items = search_items if search_items is not None else CONFIG["search_items"]
+    match = SNAPSHOT_NAME_RE.match(Path(path).stem)
+    if not match:
+        return None
+    slug = match.group("slug")
+    item = next((item for item in search_items if slugify(item["name"]) == slug), None)
+    if item is None:
+        return None
+
+    filters = dict(item["filters"])
+    cities = resolve_cities(filters.get("municipio"))
+    if match.group("city"):
+        city = next((c for c in cities if c is not None and slugify(c) == match.group("city")), None)
+        if city is None:
+            logger.warning(f"{Path(path).name}: city '{match.group('city')}' is not configured for '{item['name']}'.")
+            return None
+        filters["municipio"] = city
+    else:
+        # Older snapshot without the city: only known if the item has a single one
+        filters["municipio"] = cities[0] if len(cities) == 1 else None
+    if match.group("low"):
+        high = match.group("high")
+        filters["price_band"] = [int(match.group("low")), None if high == "up" else int(high)]
+    return {**item, "filters": filters}
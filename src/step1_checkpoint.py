@@ -0,0 +1,191 @@
+"""
+Checkpoints del Step 1: salida incremental y a prueba de fallos.
+
+Cada search item se añade a `data/step1/raw_<ts>.csv.part` en cuanto termina, y el
+manifiesto `data/step1/run_<ts>.json` registra qué items están completos. Si el
+scraper falla y `run_step` lo reintenta, se retoma la misma ejecución saltando los items
+ya completos. Solo se retoman ejecuciones de este mismo proceso: una invocación nueva
+empieza siempre de cero, para no republicar filas de ejecuciones anteriores. Al terminar,
+el `.part` se deduplica (`merge_listings`) y se publica como `raw_<ts>.csv`, que es lo
+que lee el Step 2, y el manifiesto se borra. Los restos de ejecuciones abandonadas se
+borran cuando superan `checkpoint_max_age_hours`.
+"""
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from .config import CONFIG, DATA_DIR
+from .utils import slugify
+
+logger = logging.getLogger(__name__)
+
+STEP1_DIR = DATA_DIR / "step1"
+
+# Runs started by this process: the only ones `RunCheckpoint.open` resumes
+_process_runs = set()
+
+def item_key(item_config):
+    """Stable key for one search item (any config change makes it a different item)."""
+    digest = hashlib.sha1(json.dumps(item_config, sort_keys=True).encode("utf-8")).hexdigest()[:8]
+    return f"{slugify(item_config['name'])}-{digest}"
+
+def merge_listings(df):
+    """
+    Deduplicates listings found by several queries of the same search item (e.g. one
+    per city). `municipio` keeps every city that found the listing, joined with "|".
+    """
+    if df.empty:
+        return df
+    cities = (
+        df.dropna(subset=["municipio"])
+        .groupby(["search_term", "id"], sort=False)["municipio"]
+        .agg(lambda s: "|".join(dict.fromkeys(s.astype(str))))
+    )
+    merged = df.drop_duplicates(["search_term", "id"], keep="first").copy()
+    keys = pd.MultiIndex.from_frame(merged[["search_term", "id"]])
+    merged["municipio"] = cities.reindex(keys).to_numpy()
+    if len(merged) < len(df):
+        logger.info(f"Merged {len(df) - len(merged)} duplicate listings found by several queries.")
+    return merged
+
+class RunCheckpoint:
+    """Append-only run file plus manifest for one step1 run."""
+
+    def __init__(self, run_id, manifest):
+        self.run_id = run_id
+        self.manifest = manifest
+        self.manifest_path = STEP1_DIR / f"run_{run_id}.json"
+        self.part_path = STEP1_DIR / f"raw_{run_id}.csv.part"
+        self.output_path = STEP1_DIR / f"raw_{run_id}.csv"
+
+    @classmethod
+    def open(cls, search_items):
+        """
+        Resumes the latest unfinished run of this process for the same items (a `run_step`
+        retry), or starts a new one.
+        """
+        STEP1_DIR.mkdir(parents=True, exist_ok=True)
+        keys = [item_key(item) for item in search_items]
+        cls.remove_abandoned()
+
+        for run_id in sorted(_process_runs, reverse=True):
+            path = STEP1_DIR / f"run_{run_id}.json"
+            if not path.exists():
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    manifest = json.load(f)
+            except Exception as e:
+                logger.warning(f"Ignoring unreadable manifest {path.name}: {e}")
+                continue
+
+            planned = manifest.get("planned", list(manifest["items"]))
+            if manifest.get("status") == "in_progress" and sorted(planned) == sorted(keys):
+                checkpoint = cls(manifest["run_id"], manifest)
+                logger.info(f"Resuming step1 run {checkpoint.run_id}: {len(checkpoint.completed())}/{len(manifest['items'])} items already done.")
+                return checkpoint
+
+        run_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        manifest = {
+            "run_id": run_id,
+            "status": "in_progress",
+            "started_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+            # Items added during the run (price sub-bands) are not part of the plan
+            "planned": keys,
+            "items": {
+                key: {"name": item["name"], "municipio": item["filters"].get("municipio"), "status": "pending"}
+                for key, item in zip(keys, search_items)
+            },
+        }
+        checkpoint = cls(run_id, manifest)
+        checkpoint._save_manifest()
+        _process_runs.add(run_id)
+        return checkpoint
+
+    @staticmethod
+    def remove_abandoned():
+        """Deletes manifests and run files of other runs older than `checkpoint_max_age_hours`."""
+        max_age = timedelta(hours=CONFIG["scraping"].get("checkpoint_max_age_hours", 6))
+        for path in STEP1_DIR.glob("run_*.json"):
+            run_id = path.stem[len("run_"):]
+            if run_id in _process_runs:
+                continue
+            try:
+                started = datetime.strptime(run_id, "%Y%m%d_%H%M%S")
+            except ValueError:
+                continue
+            if datetime.now() - started <= max_age:
+                continue
+            path.unlink(missing_ok=True)
+            (STEP1_DIR / f"raw_{run_id}.csv.part").unlink(missing_ok=True)
+            logger.info(f"Removed abandoned step1 run {run_id}.")
+
+    def completed(self):
+        return [key for key, entry in self.manifest["items"].items() if entry["status"] == "done"]
+
+    def is_done(self, item_config):
+        entry = self.manifest["items"].get(item_key(item_config))
+        return entry is not None and entry["status"] == "done"
+
+    def add_item(self, item_config):
+        """
+        Adds an item discovered during the run (e.g. a price sub-band). Its full config
+        is stored so a resumed run can scrape it even though it is not in the plan.
+        """
+        self.manifest["items"].setdefault(item_key(item_config), {
+            "name": item_config["name"],
+            "municipio": item_config["filters"].get("municipio"),
+            "status": "pending",
+            "item": item_config,
+        })
+        self._save_manifest()
+
+    def pending_added_items(self):
+        """Items added with `add_item` that are not done yet."""
+        return [
+            entry["item"] for entry in self.manifest["items"].values()
+            if "item" in entry and entry["status"] != "done"
+        ]
+
+    def record(self, item_config, df):
+        """Appends one finished item to the run file and marks it done in the manifest."""
+        write_header = not self.part_path.exists() or self.part_path.stat().st_size == 0
+        df.to_csv(self.part_path, mode="a", header=write_header, index=False)
+
+        entry = self.manifest["items"].setdefault(
+            item_key(item_config),
+            {"name": item_config["name"], "municipio": item_config["filters"].get("municipio")},
+        )
+        entry.update({
+            "status": "done",
+            "rows": len(df),
+            "finished_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        })
+        self._save_manifest()
+        logger.info(f"Checkpoint: saved {len(df)} items for '{entry['name']}' ({entry.get('municipio')}) to {self.part_path.name}")
+
+    def finalize(self):
+        """
+        Merges the run file (see `merge_listings`) and publishes it as raw_<run_id>.csv.
+        The manifest is deleted: once published, nothing is left to resume.
+        Returns (path, rows), or (None, 0) if nothing was scraped.
+        """
+        if not self.part_path.exists():
+            self.manifest_path.unlink(missing_ok=True)
+            return None, 0
+
+        df = merge_listings(pd.read_csv(self.part_path, dtype={"id": str}))
+        df.to_csv(self.output_path, index=False)
+        self.part_path.unlink()
+        self.manifest_path.unlink(missing_ok=True)
+        return self.output_path, len(df)
+
+    def _save_manifest(self):
+        tmp_path = self.manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.manifest, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_path, self.manifest_path)
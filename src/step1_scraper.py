@@ -4,16 +4,23 @@ Este script realiza la primera fase del scraping de Wallapop (Step 1).
 Funcionalidades principales:
 1.  **Navegación**: Abre el navegador y busca artículos basándose en los parámetros de `config.json`.
 2.  **Scroll Infinito**: Realiza scrolls iniciales, detecta y pulsa el botón "Cargar más" (incluso dentro de Shadow DOM), y continúa haciendo scroll.
-3.  **Extracción**: Recopila información básica de los artículos (título, precio, ID, URL).
+    Con `scroll_mode: "async"` todo el ciclo lo hace un scroller in-page (`execute_async_script`) que espera a cada tanda de resultados en lugar de dormir un tiempo fijo.
+3.  **Extracción**: Recopila información básica de los artículos (título, precio, ID, URL, reservado) con un único `execute_script`.
+    Con `network_capture.enabled`, los anuncios se leen de las respuestas JSON de búsqueda capturadas vía CDP y el DOM completa el resto.
 4.  **Guardado**: Almacena los datos crudos en un archivo CSV en la carpeta `data/step1/`.
 """
+import json
 import logging
 import time
+from collections import deque
 import pandas as pd
 import setuptools # Required to patch distutils
 import distutils
 import os
+from contextlib import nullcontext
 from datetime import datetime
+from pathlib import Path
+from urllib.parse import urlencode, quote
 
 import random
 from fake_useragent import UserAgent
@@ -25,10 +32,36 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from .config import CONFIG, DATA_DIR
-from .utils import get_coords
+from .utils import get_coords, slugify, CITY_COORDINATES
+from .page_scripts import (
+    CARD_EXTRACTOR_SCRIPT, CARD_IDS_SCRIPT, LOAD_MORE_SCRIPT, PAGE_PROBE_SCRIPT, SCROLLER_RUN_SCRIPT,
+    SCROLLER_STOP_SCRIPT, HARVEST_COLLECT_SCRIPT, KNOWN_IDS_TEMPLATE,
+)
+from .tracker import get_existing_ids
+from .step1_checkpoint import RunCheckpoint, merge_listings
+from . import pacing, warm_start, resource_policy, network_capture, price_bands, result_cache, webdriver_tracer, scrape_metrics, tab_pool
+from .scrape_metrics import ScrapeMetrics
 
 logger = logging.getLogger(__name__)
 
+# Result card selectors (shared by the in-page extractor and the per-element fallback)
+CARD_SELECTOR = "a[class*='item-card_ItemCard']"
+TITLE_SELECTOR = "h3[class*='item-card_ItemCard__title']"
+PRICE_SELECTOR = "strong[class*='item-card_ItemCard__price']"
+RESERVED_SELECTOR = "[class*='item-card_ItemCard__reserved'], wallapop-badge[badge-type='reserved']"
+
+# OneTrust sets this cookie once the banner has been answered
+CONSENT_COOKIE = "OptanonAlertBoxClosed"
+
+# Keep timers at full speed in headless/background tabs (in-page scroller relies on them)
+BACKGROUND_THROTTLING_FLAGS = [
+    "--disable-background-timer-throttling",
+    "--disable-backgrounding-occluded-windows",
+    "--disable-renderer-backgrounding",
+]
+
+STEP1_COLUMNS = ["id", "time_scrap", "nombre", "precio", "reservado", "url_articulo", "municipio", "search_term"]
+
 import undetected_chromedriver as uc
 
 def save_debug_html(driver, prefix="error"):
@@ -53,35 +86,143 @@ def save_debug_html(driver, prefix="error"):
     except Exception as e:
         logger.error(f"Failed to save debug artifacts: {e}")
 
-def check_for_block(driver):
+def save_snapshot(driver, item_config):
+    """
+    Saves the search results page source so it can be replayed offline (`--replay`).
+    The file name keeps the query's city and price band (see `snapshot_stem`).
+    """
+    from .snapshot_parser import snapshot_stem
+
+    try:
+        timestamp_str = datetime.now().strftime("%Y%m%d_%H%M%S")
+        snapshot_dir = DATA_DIR / CONFIG["scraping"].get("snapshot_dir", "snapshots")
+        snapshot_dir.mkdir(parents=True, exist_ok=True)
+        path = snapshot_dir / f"{snapshot_stem(item_config, timestamp_str)}.html"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(driver.page_source)
+        logger.info(f"Saved snapshot to {path}")
+    except Exception as e:
+        logger.error(f"Failed to save snapshot: {e}")
+
+def check_for_block_legacy(driver):
+    """Old check: pulls title and the full page_source. Used when the in-page probe fails."""
+    title = driver.title
+    page_source = driver.page_source
+    if "ERROR" in title:
+        marker = "title:ERROR"
+    elif "The request could not be satisfied" in title:
+        marker = "title:request could not be satisfied"
+    elif "Request blocked" in page_source:
+        marker = "body:Request blocked"
+    else:
+        marker = None
+    return {"title": title, "blocked": marker is not None, "marker": marker}
+
+def probe_page(driver, metrics=None, start_index=0):
+    """
+    Checks if the page is blocked by CloudFront or other anti-bot protections, with a
+    small in-page probe (no page_source transfer). The same round-trip returns the card
+    count, the ids loaded after `start_index` and whether "Cargar más" is present.
+    The full page dump is only saved when a block is actually detected.
+    """
+    if metrics is not None:
+        metrics.count("block_checks")
+    with (metrics.timed("block_check") if metrics is not None else nullcontext()):
+        try:
+            status = driver.execute_script(PAGE_PROBE_SCRIPT, CARD_SELECTOR, start_index)
+        except Exception as e:
+            logger.warning(f"Page probe failed: {e}. Falling back to page_source check.")
+            try:
+                status = check_for_block_legacy(driver)
+            except Exception as e:
+                logger.error(f"Error checking for block: {e}")
+                return {"blocked": False}
+
+        if status["blocked"]:
+            logger.critical("🚨 BLOCK DETECTED: CloudFront/Filter detected our request! 🚨")
+            logger.critical(f"Title: {status['title']} (marker: {status['marker']})")
+            save_debug_html(driver, prefix="blocked")
+            pacing.report_block()
+        else:
+            pacing.report_ok()
+        return status
+
+def check_for_block(driver, metrics=None):
     """Checks if the page is blocked by CloudFront or other anti-bot protections."""
+    return probe_page(driver, metrics)["blocked"]
+
+_known_ids = None
+
+def get_known_ids():
+    """Ids already in the global tracker, loaded once per process."""
+    global _known_ids
+    if _known_ids is None:
+        try:
+            _known_ids = get_existing_ids()
+        except Exception as e:
+            logger.warning(f"Could not load tracker ids: {e}")
+            _known_ids = set()
+    return _known_ids
+
+def skip_known_enabled():
+    return bool(CONFIG["scraping"].get("skip_known_ids", False))
+
+def install_known_ids(driver):
+    """
+    Ships the tracker ids into the page (window.__wsKnown) so the in-page extractor only
+    returns unseen listings. Registered once per tab with Page.addScriptToEvaluateOnNewDocument,
+    so the list is not re-sent on every navigation. Returns False if it must be injected
+    after each page load instead (see `inject_known_ids`).
+    """
+    installed = getattr(driver, "_wallascrap_known_tabs", None)
+    if installed is None:
+        installed = driver._wallascrap_known_tabs = set()
+    handle = driver.current_window_handle
+    if handle in installed:
+        return True
+    source = KNOWN_IDS_TEMPLATE.format(ids_json=json.dumps(",".join(sorted(get_known_ids()))))
     try:
-        title = driver.title
-        page_source = driver.page_source
-        
-        if "ERROR" in title or "The request could not be satisfied" in title or "Request blocked" in page_source:
-             logger.critical("🚨 BLOCK DETECTED: CloudFront/Filter detected our request! 🚨")
-             logger.critical(f"Title: {title}")
-             save_debug_html(driver, prefix="blocked")
-             return True
-             
-        return False
+        driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": source})
     except Exception as e:
-        logger.error(f"Error checking for block: {e}")
+        logger.warning(f"Could not register known ids via CDP: {e}. Injecting them on every page.")
+        return False
+    installed.add(handle)
+    logger.info(f"Known ids registered in the page: {len(get_known_ids())} ids.")
+    return True
+
+def inject_known_ids(driver):
+    """Per-page fallback of `install_known_ids` (the list travels on every navigation)."""
+    source = KNOWN_IDS_TEMPLATE.format(ids_json=json.dumps(",".join(sorted(get_known_ids()))))
+    driver.execute_script(source)
+
+def network_logging_enabled():
+    """
+    True if some search reads the CDP performance log (resource report or network capture).
+    Never in the window pool: windows share one log that no search drains, so it would
+    only grow for the whole run.
+    """
+    if tab_pool.tabs_per_browser() > 1:
         return False
+    return resource_policy.report_enabled() or network_capture.is_enabled()
 
-def random_sleep(min_seconds=0.5, max_seconds=2.0):
-    """Sleeps for a random amount of time to simulate human behavior."""
-    sleep_time = random.uniform(min_seconds, max_seconds)
-    time.sleep(sleep_time)
+def setup_driver(profile_dir=None):
+    """
+    Creates the Chrome driver.
+    profile_dir: optional user-data-dir, so parallel workers never share a profile.
+    With `scraping.warm_start.enabled` the patched driver, the profile (cookie consent)
+    and the User-Agent list are reused between runs.
+    """
+    start_time = time.perf_counter()
+    warm = warm_start.is_enabled()
+    version_main = warm_start.get_chrome_major_version() if warm else None
+    if warm and profile_dir is None:
+        profile_dir = str(warm_start.profile_dir())
 
-def setup_driver():
     options = uc.ChromeOptions()
     
     # 1. Random User-Agent
     try:
-        ua = UserAgent()
-        random_ua = ua.random
+        random_ua = warm_start.random_user_agent() if warm else UserAgent().random
         logger.info(f"Using Random User-Agent: {random_ua}")
         options.add_argument(f'user-agent={random_ua}')
     except Exception as e:
@@ -94,6 +235,8 @@ def setup_driver():
     options.add_argument('--disable-gpu')
     options.add_argument('--no-sandbox')
     options.add_argument('--disable-dev-shm-usage')
+    for flag in BACKGROUND_THROTTLING_FLAGS:
+        options.add_argument(flag)
              
     # Referer Spoofing (Try to look like we come from Google)
     options.add_argument('--referrer=https://www.google.com/')
@@ -103,6 +246,10 @@ def setup_driver():
     selected_size = random.choice(window_sizes)
     logger.info(f"Using Random Window Size: {selected_size}")
     options.add_argument(f'--window-size={selected_size}')
+
+    # 3. CDP network events (resource report / network capture)
+    if network_logging_enabled():
+        resource_policy.enable_network_logging(options)
     
     # Enable shadow-root (UC handles this well, but just in case)
     
@@ -115,7 +262,20 @@ def setup_driver():
         try:
             # uc automatically handles driver download and patching
             # version_main allows pinning major version if needed, but usually auto is best
-            driver = uc.Chrome(options=options)
+            uc_kwargs = {}
+            cached_driver = warm_start.cached_driver_path(version_main) if warm else None
+            if cached_driver:
+                uc_kwargs["driver_executable_path"] = str(cached_driver)
+            if version_main:
+                uc_kwargs["version_main"] = version_main
+
+            driver = uc.Chrome(options=options, user_data_dir=profile_dir, **uc_kwargs)
+            if warm and not cached_driver:
+                warm_start.store_patched_driver(driver, version_main)
+            resource_policy.apply_resource_policy(driver)
+            network_capture.enable_capture(driver)
+            webdriver_tracer.instrument_driver(driver)
+            logger.info(f"Driver ready in {time.perf_counter() - start_time:.1f}s (warm_start={warm})")
             return driver
         except Exception as e:
             logger.warning(f"Failed to initialize undetected_chromedriver: {e}. Fallback to standard Selenium.")
@@ -127,21 +287,38 @@ def setup_driver():
     options_std.add_argument('--disable-gpu')
     options_std.add_argument('--no-sandbox')
     options_std.add_argument('--disable-dev-shm-usage')
+    for flag in BACKGROUND_THROTTLING_FLAGS:
+        options_std.add_argument(flag)
+    if profile_dir:
+        options_std.add_argument(f'--user-data-dir={profile_dir}')
+    if network_logging_enabled():
+        resource_policy.enable_network_logging(options_std)
     
-    service = ChromeService(ChromeDriverManager().install())
+    if warm:
+        driver_path = warm_start.cached_std_driver(version_main, lambda: ChromeDriverManager().install())
+    else:
+        driver_path = ChromeDriverManager().install()
+    service = ChromeService(driver_path)
     driver = webdriver.Chrome(service=service, options=options_std)
+    resource_policy.apply_resource_policy(driver)
+    network_capture.enable_capture(driver)
+    webdriver_tracer.instrument_driver(driver)
+    logger.info(f"Driver ready in {time.perf_counter() - start_time:.1f}s (warm_start={warm})")
         
     return driver
 
-def build_url(item_config):
+SEARCH_URL = "https://es.wallapop.com/app/search"
+
+def build_search_params(item_config):
+    """
+    Query semantics shared by every backend (browser URL and HTTP/JSON API):
+    keywords, coordinates, distance and conditions, as an ordered list of pairs.
+    """
     name = item_config["name"]
     filters = item_config["filters"]
     
-    # Use simple replacement to handle any number of words, robustly
-    keywords = name.replace(" ", "%20")
-    
-    # Hardcoded coordinates for Madrid as requested
-    # longitude=-3.69196&latitude=40.41956
+    # Coordinates of the item's city (get_coords defaults to Madrid)
+    longitude, latitude = get_coords(filters.get("municipio"))
     
     # Handle distance: config has "10000" (likely meters). 
     # User snippet had distance + '000' (implying km input).
@@ -153,91 +330,235 @@ def build_url(item_config):
     else:
         dist = raw_dist
 
-    # Base URL
-    url = f"https://es.wallapop.com/app/search?filters_source=quick_filters&keywords={keywords}&longitude=-3.69196&latitude=40.41956&distance={dist}"
-
-
+    params = [
+        ("keywords", name),
+        ("longitude", str(longitude)),
+        ("latitude", str(latitude)),
+        ("distance", dist),
+    ]
     
     # Handle Conditions (Multiple states)
     conditions_dict = filters.get("conditions")
     if conditions_dict and isinstance(conditions_dict, dict):
         active_conditions = [k for k, v in conditions_dict.items() if v]
         if active_conditions:
-            joined_conditions = "%2C".join(active_conditions)
-            url += f"&condition={joined_conditions}"
+            params.append(("condition", ",".join(active_conditions)))
     
     # Legacy: Fallback to simple 'estado' if 'conditions' not present
     elif filters.get("estado") and filters.get("estado").lower() != "all":
-         estado = filters.get("estado")
-         url += f"&condition={estado}"
+         params.append(("condition", filters.get("estado")))
          
-    return url
+    # Price band set by `price_bands` partitioning
+    band = filters.get("price_band")
+    if band:
+        params.append(("min_sale_price", str(band[0])))
+        if band[1] is not None:
+            params.append(("max_sale_price", str(band[1])))
 
-def scrape_item(driver, item_config):
-    url = build_url(item_config)
-    logger.info(f"Navigating to: {url}")
-    driver.get(url)
-    random_sleep(2.0, 4.0) # Jitter after load
-    
-    if check_for_block(driver):
-        raise Exception("Navegación bloqueada por CloudFront/Wallapop (Title: ERROR)")
-    
-    # Cookie/Privacy Banner
-    try:
-        WebDriverWait(driver, 10).until(
-            EC.element_to_be_clickable((By.ID, "onetrust-reject-all-handler"))
-        ).click()
-        logger.info("Cookies rejected.")
-    except Exception:
-         logger.info("No cookie banner found or already handled.")
 
-    driver.maximize_window()
+    return params
+
+ALL_CITIES_VALUES = {"all", "all_provinces", "todas"}
+
+def resolve_cities(municipio):
+    """`municipio` may be a city, a list of cities or "all" / "all provinces" (every city in CITY_COORDINATES)."""
+    # "all provinces", "All_Provinces", "todas"...
+    if isinstance(municipio, str) and "_".join(municipio.lower().replace("_", " ").split()) in ALL_CITIES_VALUES:
+        return list(CITY_COORDINATES)
+    if isinstance(municipio, (list, tuple)):
+        cities = list(dict.fromkeys(municipio))
+    else:
+        cities = [municipio]
+    for city in cities:
+        if city is not None and city not in CITY_COORDINATES:
+            logger.warning(f"Unknown city '{city}': falling back to Madrid coordinates.")
+    return cities
+
+def expand_search_items(search_items):
+    """Fans out multi-city items into one geo-scoped query per city."""
+    queries = []
+    for item in search_items:
+        cities = resolve_cities(item["filters"].get("municipio"))
+        if len(cities) == 1:
+            queries.append({**item, "filters": {**item["filters"], "municipio": cities[0]}})
+            continue
+        logger.info(f"Fanning out '{item['name']}' to {len(cities)} cities.")
+        for city in cities:
+            queries.append({**item, "filters": {**item["filters"], "municipio": city}})
+    return queries
+
+def item_label(item_config):
+    """Human readable name of a query, including the city and price band."""
+    city = item_config["filters"].get("municipio")
+    label = f"{item_config['name']} @ {city}" if city else item_config["name"]
+    band = item_config["filters"].get("price_band")
+    return f"{label} {price_bands.format_band(band)}" if band else label
+
+def build_url(item_config):
+    # quote (not quote_plus): spaces become %20 and commas %2C, as the web app expects
+    params = [("filters_source", "quick_filters")] + build_search_params(item_config)
+    return f"{SEARCH_URL}?{urlencode(params, quote_via=quote)}"
+
+def extract_cards_legacy(driver):
+    """Per-element extraction (several WebDriver round-trips per card). Kept as fallback."""
+    items = driver.find_elements(By.CSS_SELECTOR, CARD_SELECTOR)
+    cards = []
     
-    # Load More Button Strategy: Loop up to 10 times (Scroll -> Search -> Click)
-    button_found = False
-    logger.info("Iniciando ciclo de búsqueda del botón 'Cargar más' (10 intentos)...")
+    for item in items:
+        try:
+            link = item.get_attribute('href')
+            
+            # Title selector: h3[class*="item-card_ItemCard__title"]
+            # We try to find it within the item element
+            try:
+                title_elem = item.find_element(By.CSS_SELECTOR, TITLE_SELECTOR)
+                title = title_elem.text.strip()
+            except:
+                title = item.get_attribute('title') or "No Title"
 
-    # Script to find the button even inside Shadow DOM
-    # Script to find the button even inside Shadow DOM
-    script = """
-    return (function() {
-        // Target class from logs
-        const targetClass = 'walla-button__button walla-button__button--medium walla-button__button--primary';
-        
-        const candidates = document.querySelectorAll('walla-button');
-        for (const host of candidates) {
-            // Priority 1: Check host text
-            if (host.innerText && (host.innerText.toLowerCase().includes('cargar más') || host.innerText.toLowerCase().includes('ver más') || host.innerText.toLowerCase().includes('load'))) {
-                return host;
-            }
+            # Price selector: strong[class*="item-card_ItemCard__price"]
+            try:
+                price_elem = item.find_element(By.CSS_SELECTOR, PRICE_SELECTOR)
+                price = price_elem.text.strip()
+            except:
+                price = "0"
+
+            reserved = bool(item.find_elements(By.CSS_SELECTOR, RESERVED_SELECTOR)) or "reservado" in item.text.lower()
             
-            // Check in Shadow DOM
-            if (host.shadowRoot) {
-                // Priority 2: Check by specific Class inside Shadow DOM
-                const classBtn = host.shadowRoot.querySelector(`button[class='${targetClass}']`);
-                if (classBtn) return classBtn;
-
-                // Priority 3: Check by text inside Shadow DOM (fallback)
-                const innerBtn = host.shadowRoot.querySelector('button');
-                if (innerBtn) {
-                        const txt = innerBtn.innerText || innerBtn.textContent;
-                        if (txt && (txt.toLowerCase().includes('cargar') || txt.toLowerCase().includes('ver más') || txt.toLowerCase().includes('load'))) {
-                            return innerBtn;
-                        }
-                }
-            }
-        }
-        return null;
-    })();
+            cards.append({
+                "id": link.split('-')[-1],
+                "href": link,
+                "title": title,
+                "price": price,
+                "reserved": reserved
+            })
+        except Exception as e:
+            logger.debug(f"Error parsing item: {e}")
+            continue
+            
+    return cards
+
+def extract_new_cards(driver, skip_known=False):
+    """
+    Extracts every result card (id, href, title, price, reserved) with a single
+    execute_script call. Falls back to the per-element path if the script fails.
+    With skip_known, listings already in the tracker are only counted.
+    Returns (cards, known_count).
+    """
+    try:
+        payload = json.loads(driver.execute_script(
+            CARD_EXTRACTOR_SCRIPT, CARD_SELECTOR, TITLE_SELECTOR, PRICE_SELECTOR, RESERVED_SELECTOR, skip_known
+        ))
+        return payload["cards"], payload["known"]
+    except Exception as e:
+        logger.warning(f"In-page card extractor failed: {e}. Falling back to per-element extraction.")
+        cards = extract_cards_legacy(driver)
+        return split_known(cards) if skip_known else (cards, 0)
+
+def extract_cards(driver):
+    """All result cards on the page (see `extract_new_cards`)."""
+    return extract_new_cards(driver)[0]
+
+def split_known(cards):
+    """Drops cards whose id is already in the tracker. Returns (new cards, known count)."""
+    known_ids = get_known_ids()
+    new_cards = [card for card in cards if card["id"] not in known_ids]
+    return new_cards, len(cards) - len(new_cards)
+
+def collect_harvested(driver):
+    """(cards, known_count) harvested by the in-page scroller on this page, or None if it did not harvest."""
+    try:
+        payload = driver.execute_script(HARVEST_COLLECT_SCRIPT)
+    except Exception as e:
+        logger.warning(f"Could not collect harvested cards: {e}")
+        return None
+    if payload is None:
+        return None
+    payload = json.loads(payload)
+    return payload["cards"], payload["known"]
+
+def extract_page_cards(driver, use_scroller=False, skip_known=False, pruning=False):
+    """
+    DOM extraction for the current page, as (cards, known_count). The in-page scroller
+    may have harvested (and pruned) the cards already, even if Python scrolling took over
+    later; collecting also harvests the remaining ones.
+    With `pruning`, the DOM no longer holds the harvested cards: if the harvest cannot
+    be collected, fail instead of extracting empty cards.
     """
+    harvested = collect_harvested(driver) if use_scroller else None
+    if harvested is not None:
+        return harvested
+    if pruning:
+        raise Exception("Harvested cards could not be collected and the DOM cards were pruned.")
+    return extract_new_cards(driver, skip_known)
+
+def mark_pruning(progress, options):
+    """Records that a scroller run with these options may have emptied harvested cards."""
+    if options["harvest"] and options["harvest"]["prune"]:
+        progress.pruning = True
+
+def cards_to_dataframe(cards, item_config, time_scrap=None):
+    """Converts raw card records into the step1 DataFrame schema."""
+    time_scrap = (time_scrap or datetime.now()).strftime("%Y-%m-%d %H:%M:%S")
+    data = [
+        {
+            "id": card["id"],
+            "time_scrap": time_scrap,
+            "nombre": card["title"],
+            "precio": card["price"],
+            "reservado": card["reserved"],
+            "url_articulo": card["href"],
+            "municipio": item_config["filters"].get("municipio"),
+            "search_term": item_config["name"]
+        }
+        for card in cards
+    ]
+    return pd.DataFrame(data, columns=STEP1_COLUMNS)
+
+class ScrollProgress:
+    """Scroll budget, counters and the stop rules shared by the Python and in-page scroll loops."""
+
+    def __init__(self, max_scrolls):
+        self.max_scrolls = max_scrolls
+        self.stale_limit = CONFIG["scraping"].get("stop_after_stale_scrolls", 3)
+        self.known_ratio_limit = CONFIG["scraping"].get("known_stop_ratio", 0.9)
+        self.known_min_cards = CONFIG["scraping"].get("known_stop_min_cards", 10)
+        self.known_ids = get_known_ids() if self.known_ratio_limit else set()
+        self.scrolls = 0
+        self.card_count = 0
+        self.clicks = 0
+        self.reason = "max_scrolls"
+        self.peak_js_heap_mb = None
+        self.peak_dom_nodes = None
+        self.pruning = False # An in-page scroller that empties harvested cards was started
+
+    def sample_memory(self, driver):
+        """Keeps the peak renderer memory seen while scrolling."""
+        memory = resource_policy.renderer_memory(driver)
+        if memory is None:
+            return
+        self.peak_js_heap_mb = max(self.peak_js_heap_mb or 0.0, memory["js_heap_mb"])
+        self.peak_dom_nodes = max(self.peak_dom_nodes or 0, memory["dom_nodes"])
+
+    def caught_up(self, new_ids):
+        """Caught up with listings we already know (feed is newest-first)."""
+        if not self.known_ids or len(new_ids) < self.known_min_cards:
+            return False
+        known_ratio = sum(1 for i in new_ids if i in self.known_ids) / len(new_ids)
+        return known_ratio >= self.known_ratio_limit
+
+def load_more_python(driver, metrics):
+    """Load More Button Strategy: Loop up to 10 times (Scroll -> Search -> Click)"""
+    button_found = False
+    logger.info("Iniciando ciclo de búsqueda del botón 'Cargar más' (10 intentos)...")
 
     for i in range(10):
         driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        random_sleep(0.5, 1.5) # Jitter between scrolls
+        pacing.pace("load_more") # Jitter between scrolls
         
         # 2. Search & Click cargar más
         try:
-            boton_ver_mas = driver.execute_script(script)
+            boton_ver_mas = driver.execute_script(LOAD_MORE_SCRIPT) # Finds the button even inside Shadow DOM
             
             # Fallback: XPath provided by user
             if not boton_ver_mas:
@@ -255,7 +576,7 @@ def scrape_item(driver, item_config):
                 logger.info(f"Identificadores del botón para futuro uso: ID='{btn_id}', Class='{btn_class}'")
                 
                 driver.execute_script("arguments[0].scrollIntoView(true);", boton_ver_mas)
-                random_sleep(0.5, 1.0)
+                pacing.pace("click")
                 try:
                     boton_ver_mas.click()
                 except:
@@ -272,30 +593,294 @@ def scrape_item(driver, item_config):
          save_debug_html(driver, prefix="error_load_more")
          raise Exception("Botón no encontrado")
          
-    time.sleep(0.5)
-    # Main Scroll Loop
-    # Logic from src_old: Scroll 25 times (configurable)
-    n_scrolls_cada_vez = CONFIG["scraping"].get("scrolls", 25)
-    n = 0
-    logger.info(f"Starting main scrolling ({n_scrolls_cada_vez} times)...")
+    metrics.count("load_more_attempts", i + 1)
+
+def scroll_feed_python(driver, metrics, progress):
+    """One scroll per round-trip, paced from Python (fallback for the in-page scroller)."""
+    stale_scrolls = 0
+    progress.reason = "max_scrolls"
+    progress.card_count = driver.execute_script(CARD_IDS_SCRIPT, CARD_SELECTOR, 0)["count"]
+    logger.info(f"Starting main scrolling (up to {progress.max_scrolls} times, {progress.card_count} cards loaded)...")
     try:
-        while n < n_scrolls_cada_vez:
+        while progress.scrolls < progress.max_scrolls:
             driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-            random_sleep(1.0, 2.5) # Random sleep between main scrolls
+            pacing.pace("scroll") # Paced (token bucket + jitter + backoff) sleep between main scrolls
             
-            if check_for_block(driver):
+            # One probe round-trip: block check + new card ids
+            status = probe_page(driver, metrics, start_index=progress.card_count)
+            if status["blocked"]:
+                 progress.reason = "blocked"
                  raise Exception("Bloqueo detectado durante el scroll.")
                  
-            n += 1
-            print(f"scroll {n}")
+            progress.scrolls += 1
+            if "ids" in status:
+                new_ids = status["ids"]
+                progress.card_count = status["count"]
+            else:
+                # Probe unavailable (legacy block check): read progress separately
+                batch = driver.execute_script(CARD_IDS_SCRIPT, CARD_SELECTOR, progress.card_count)
+                new_ids = batch["ids"]
+                progress.card_count = batch["count"]
+            logger.info(f"Scroll {progress.scrolls} (+{len(new_ids)} cards, total {progress.card_count})")
+
+            # 1. Feed stopped growing
+            if new_ids:
+                stale_scrolls = 0
+            else:
+                stale_scrolls += 1
+                if stale_scrolls >= progress.stale_limit:
+                    progress.reason = "stale"
+                    break
+
+            # 2. Caught up with listings we already know
+            if progress.caught_up(new_ids):
+                progress.reason = "caught_up"
+                break
     except Exception as e:
         logger.error(f"Ocurrió un error durante el scroll principal: {e}")
 
+def async_scroller_config():
+    return CONFIG["scraping"].get("async_scroller", {})
+
+def scroller_options(progress):
+    """Options for the in-page scroller (see SCROLLER_INSTALL in page_scripts)."""
+    config = async_scroller_config()
+    scheduler = pacing.get_scheduler()
+    return {
+        "maxScrolls": progress.max_scrolls,
+        "staleLimit": progress.stale_limit,
+        "target": config.get("target_cards", 0),
+        "settleMs": config.get("settle_ms", 300),
+        "batchTimeoutMs": int(config.get("batch_timeout_seconds", 8) * 1000),
+        "maxClicks": 1,
+        "buttonAttempts": 10,
+        # Same politeness gap as pace("scroll"), refreshed every chunk so backoff applies
+        "minGapMs": int(scheduler.base_delay("scroll") * 1000),
+        "jitter": scheduler.jitter,
+        "harvest": {
+            "titleSel": TITLE_SELECTOR,
+            "priceSel": PRICE_SELECTOR,
+            "reservedSel": RESERVED_SELECTOR,
+            # Emptied cards would end up in the snapshot: no pruning while saving snapshots
+            "prune": config.get("prune_harvested", False) and not CONFIG["scraping"].get("save_snapshots", False),
+            "skipKnown": skip_known_enabled(),
+        } if config.get("harvest", False) else None,
+    }
+
+def scroll_feed_async(driver, metrics, progress):
+    """
+    In-page scroller: one execute_async_script per chunk of scrolls instead of one
+    round-trip plus a fixed sleep per scroll. Each scroll waits for the DOM to report the
+    next batch. Between chunks we check for blocks and for already-known listings.
+    Raises if the scroller itself fails, so the caller can fall back to Python scrolling.
+    """
+    chunk = max(1, async_scroller_config().get("chunk_scrolls", 5))
+    logger.info(f"Starting in-page scrolling (up to {progress.max_scrolls} scrolls, chunks of {chunk})...")
+    while True:
+        pacing.acquire("scroll", chunk) # A token per scroll of the chunk; the gap between scrolls is in-page
+        options = scroller_options(progress)
+        mark_pruning(progress, options)
+        max_gap = options["minGapMs"] * (1 + options["jitter"]) + options["batchTimeoutMs"]
+        driver.set_script_timeout(chunk * max_gap / 1000 + 10)
+        report = driver.execute_async_script(SCROLLER_RUN_SCRIPT, CARD_SELECTOR, options, chunk)
+        if apply_scroller_report(driver, metrics, progress, report):
+            break
+
+def apply_scroller_report(driver, metrics, progress, report):
+    """
+    Updates `progress` from an in-page scroller report and checks for blocks and known
+    listings. Returns True when scrolling should stop (`progress.reason` is set).
+    """
+    if report["error"]:
+        raise Exception(report["error"])
+
+    progress.scrolls = report["scrolls"]
+    progress.card_count = report["count"]
+    progress.clicks = report["clicks"]
+    progress.sample_memory(driver)
+    metrics.count("scroll_chunks")
+    logger.info(f"Scroll {progress.scrolls} (+{len(report['ids'])} cards, total {progress.card_count}, harvested {report['harvested']})")
+
+    status = probe_page(driver, metrics, start_index=progress.card_count)
+    if status["blocked"]:
+        progress.reason = "blocked"
+        logger.error("Ocurrió un error durante el scroll principal: Bloqueo detectado durante el scroll.")
+        return True
+    if report["done"]:
+        progress.reason = report["reason"]
+        return True
+    if progress.caught_up(report["ids"]):
+        progress.reason = "caught_up"
+        return True
+    return False
+
+def scrape_item(driver, item_config):
+    """
+    Scrapes one search item and writes its timing record (see `scrape_metrics`).
+    Served from `result_cache` when the same query was scraped within the TTL.
+    """
+    cached = result_cache.get(item_config)
+    if cached is not None:
+        return cached
+    metrics = ScrapeMetrics(item_config, driver=driver)
+    try:
+        df = _scrape_item(driver, item_config, metrics)
+    except Exception as e:
+        metrics.finish("error", e)
+        raise
+    metrics.count("cards_extracted", len(df))
+    metrics.finish()
+    result_cache.put(item_config, df)
+    return df
+
+def _scrape_item(driver, item_config, metrics):
+    page = open_search(driver, item_config, metrics)
+    
+    # Main Scroll Loop
+    # Logic from src_old: Scroll 25 times (configurable)
+    # Stops early when the feed stops growing or when we reach listings already in the tracker
+    progress = ScrollProgress(CONFIG["scraping"].get("scrolls", 25))
+    scrolled_in_page = False
+    if page["use_scroller"]:
+        try:
+            scroll_feed_async(driver, metrics, progress)
+            scrolled_in_page = True
+        except Exception as e:
+            logger.warning(f"In-page scroller failed: {e}. Falling back to Python scrolling.")
+            try:
+                driver.execute_script(SCROLLER_STOP_SCRIPT, "fallback")
+            except Exception:
+                pass
+    scrolled_in_page = scroll_fallback(driver, metrics, progress, scrolled_in_page)
+    return finish_search(driver, item_config, metrics, page, progress, scrolled_in_page)
+
+def open_search(driver, item_config, metrics, network=True):
+    """
+    Navigation phase of one search: load the results page, check for blocks and
+    handle the cookie banner. Returns the page state used by `finish_search`.
+    network=False skips the CDP network events (windows share one performance log).
+    """
+    url = build_url(item_config)
+    logger.info(f"Navigating to: {url}")
+    network_events = network and network_logging_enabled()
+    if network_events:
+        resource_policy.drain_network_events(driver) # Discard events from the previous search
+    skip_known = skip_known_enabled()
+    known_per_page = skip_known and not install_known_ids(driver)
+    # Token (and jitter) before the request: a worker's first navigation and the next
+    # item's navigation right after the previous one also go through the bucket
+    pacing.pace("navigate")
+    get_start = time.perf_counter()
+    driver.get(url)
+    pacing.report_page_time(time.perf_counter() - get_start)
+    load_seconds = resource_policy.page_load_seconds(driver) if network and resource_policy.report_enabled() else None
+    if known_per_page:
+        inject_known_ids(driver)
+    metrics.lap("navigate")
+    
+    if check_for_block(driver, metrics):
+        raise Exception("Navegación bloqueada por CloudFront/Wallapop (Title: ERROR)")
+    
+    # Cookie/Privacy Banner
+    # With a persistent profile the consent cookie survives between runs: skip the 10 s wait
+    try:
+        consent_saved = driver.get_cookie(CONSENT_COOKIE) is not None
+    except Exception:
+        consent_saved = False
+
+    if consent_saved:
+        logger.info("Cookie consent already stored in profile.")
+    else:
+        try:
+            WebDriverWait(driver, 10).until(
+                EC.element_to_be_clickable((By.ID, "onetrust-reject-all-handler"))
+            ).click()
+            logger.info("Cookies rejected.")
+        except Exception:
+             logger.info("No cookie banner found or already handled.")
+
+    driver.maximize_window()
+    metrics.lap("cookies")
+    return {
+        "load_seconds": load_seconds,
+        "network_events": network_events,
+        "skip_known": skip_known,
+        "use_scroller": CONFIG["scraping"].get("scroll_mode", "python") == "async",
+    }
+
+def scroll_fallback(driver, metrics, progress, scrolled_in_page):
+    """
+    Python side of the scroll phase: the "Cargar más" search (with XPath fallback) when
+    the in-page scroller did not click it or did not run, then Python scrolling unless
+    the scroller finished the job. Returns True if the scroller did the whole phase.
+    """
+    if progress.clicks == 0 and progress.reason != "blocked":
+        # "Cargar más" not clicked in-page (or scroller off): Python search, with XPath fallback
+        load_more_python(driver, metrics)
+        progress.clicks = 1
+        metrics.lap("load_more")
+        time.sleep(0.5)
+        scrolled_in_page = False
+    if not scrolled_in_page:
+        scroll_feed_python(driver, metrics, progress)
+    return scrolled_in_page
+
+def finish_search(driver, item_config, metrics, page, progress, scrolled_in_page):
+    """Extraction phase of one search: scroll report, optional snapshot, cards -> DataFrame."""
+    progress.sample_memory(driver)
+
+    logger.info(
+        f"Scroll stopped for '{item_config['name']}': reason={progress.reason}, "
+        f"scrolls={progress.scrolls}/{progress.max_scrolls} ({progress.max_scrolls - progress.scrolls} saved), cards={progress.card_count}"
+    )
+    if progress.peak_js_heap_mb is not None:
+        logger.info(f"Peak renderer memory: JS heap {progress.peak_js_heap_mb:.1f} MB, {progress.peak_dom_nodes} DOM nodes")
+        metrics.set("peak_js_heap_mb", round(progress.peak_js_heap_mb, 1))
+        metrics.set("peak_dom_nodes", progress.peak_dom_nodes)
+    metrics.lap("scroll")
+    metrics.count("scrolls", progress.scrolls)
+    metrics.count("cards_loaded", progress.card_count)
+    metrics.count("load_more_clicks", progress.clicks)
+    metrics.set("stop_reason", progress.reason)
+    metrics.set("scroll_mode", "async" if scrolled_in_page else "python")
+
+    if CONFIG["scraping"].get("save_snapshots", False):
+        save_snapshot(driver, item_config)
+
+    # Read the network events once: shared by the resource report and the network capture
+    if page["network_events"]:
+        events = resource_policy.drain_network_events(driver)
+        resource_policy.log_resource_report(driver, item_config, page["load_seconds"], events=events)
+    else:
+        events = None
+    metrics.lap("report")
+
     # Parse key elements
-    items = driver.find_elements(By.CSS_SELECTOR, "a[class*='item-card_ItemCard']")
-    logger.info(f"Found {len(items)} items in the DOM.")
+    skip_known = page["skip_known"]
+    cards = network_capture.capture_cards(driver, events) if events is not None and network_capture.is_enabled() else []
+    metrics.count("cards_captured", len(cards))
+    if cards:
+        # The first batch is server-rendered (no XHR): complete with listings only in the DOM
+        captured_ids = {card["id"] for card in cards}
+        dom_ids = driver.execute_script(CARD_IDS_SCRIPT, CARD_SELECTOR, 0)["ids"]
+        known_ids = get_known_ids() if skip_known else set()
+        known = len((captured_ids | set(dom_ids)) & known_ids)
+        cards = [card for card in cards if card["id"] not in known_ids]
+        if any(i not in captured_ids and i not in known_ids for i in dom_ids):
+            dom_cards, _ = extract_page_cards(driver, page["use_scroller"], skip_known, progress.pruning)
+            dom_only = [card for card in dom_cards if card["id"] not in captured_ids]
+            logger.info(f"Completed {len(dom_only)} listings found only in the DOM.")
+            cards.extend(dom_only)
+    else:
+        cards, known = extract_page_cards(driver, page["use_scroller"], skip_known, progress.pruning)
+    metrics.lap("extract")
+    metrics.count("cards_known", known)
+    if skip_known:
+        logger.info(f"Found {len(cards)} new items in the DOM ({known} already known, skipped).")
+    else:
+        logger.info(f"Found {len(cards)} items in the DOM.")
     
-    if len(items) == 0:
+    if len(cards) == 0 and known == 0:
         logger.info(f"Current URL: {driver.current_url}")
         
         # Save HTML & Screenshot for debug
@@ -303,74 +888,139 @@ def scrape_item(driver, item_config):
         
         raise Exception("Scraping failed: No items found in DOM.")
         
-    data = []
-    
-    for item in items:
+    df = cards_to_dataframe(cards, item_config)
+    df.attrs["scroll_stop"] = {"reason": progress.reason, "scrolls": progress.scrolls, "max_scrolls": progress.max_scrolls}
+    return df
+
+def run_scraper(backend=None):
+    """
+    backend: "selenium" (default) or "http" (JSON search API, no browser).
+    Defaults to `scraping.backend` in the config.
+
+    Each finished item is checkpointed immediately (see `step1_checkpoint`), so a
+    retry only scrapes the items that did not complete. With `price_partition`,
+    bands that overflow the scroll budget are split and re-enqueued (see `price_bands`).
+    `workers` browsers each scrape `tabs_per_browser` items at a time (see `tab_pool`).
+    """
+    search_items = expand_search_items(CONFIG["search_items"])
+    if price_bands.is_enabled():
+        search_items = price_bands.expand_price_bands(search_items)
+    backend = backend or CONFIG["scraping"].get("backend", "selenium")
+
+    checkpoint = RunCheckpoint.open(search_items)
+    scrape_metrics.set_run_id(checkpoint.run_id)
+    pending = [item for item in search_items if not checkpoint.is_done(item)]
+    for item in search_items:
+        if checkpoint.is_done(item):
+            logger.info(f"Skipping item already completed in this run: {item_label(item)}")
+    pending.extend(checkpoint.pending_added_items())
+    workers = min(CONFIG["scraping"].get("workers", 1), len(pending))
+
+    def on_result(item, df):
+        """Checkpoints one finished item; returns the follow-up items to scrape (price sub-bands)."""
+        checkpoint.record(item, df)
+        children = price_bands.follow_up_items(item, df) if price_bands.is_enabled() else []
+        for child in children:
+            checkpoint.add_item(child)
+        return children
+
+    if not pending:
+        logger.info("All search items already completed in this run.")
+    elif backend == "http":
+        from .http_search import create_session, scrape_item_http
+        with create_session() as session:
+            queue = deque(pending)
+            while queue:
+                item = queue.popleft()
+                logger.info(f"Scraping item (http): {item_label(item)}")
+                try:
+                    queue.extend(on_result(item, scrape_item_http(session, item)))
+                except Exception as e:
+                    logger.error(f"Error scraping {item_label(item)}: {e}")
+                    raise e
+    elif workers > 1:
+        from .scraper_pool import run_pool
+        run_pool(pending, workers, on_result=on_result)
+    else:
+        driver = setup_driver()
         try:
-            link = item.get_attribute('href')
-            
-            # Title selector: h3[class*="item-card_ItemCard__title"]
-            # We try to find it within the item element
-            try:
-                title_elem = item.find_element(By.CSS_SELECTOR, "h3[class*='item-card_ItemCard__title']")
-                title = title_elem.text.strip()
-            except:
-                title = item.get_attribute('title') or "No Title"
+            queue = deque(pending)
+            if tab_pool.tabs_per_browser() > 1:
+                # Tabs drain the queue, follow-up items included
+                def on_error(_, item, e):
+                    logger.error(f"Error scraping {item_label(item)}: {e}")
+                    raise e
+                tab_pool.run_tabs(
+                    driver,
+                    next_task=lambda block: (None, queue.popleft()) if queue else None,
+                    on_done=lambda _, item, df: queue.extend(on_result(item, df)),
+                    on_error=on_error,
+                )
+            while queue:
+                item = queue.popleft()
+                logger.info(f"Scraping item: {item_label(item)}")
+                
+                # No Retry logic: Fail fast as requested
+                try:
+                    df = scrape_item(driver, item)
+                    queue.extend(on_result(item, df))
+                except Exception as e:
+                    logger.error(f"Error scraping {item_label(item)}: {e}")
+                    raise e
+        finally:
+            driver.quit()
 
-            # Price selector: strong[class*="item-card_ItemCard__price"]
-            try:
-                price_elem = item.find_element(By.CSS_SELECTOR, "strong[class*='item-card_ItemCard__price']")
-                price = price_elem.text.strip()
-            except:
-                price = "0"
-            
-            item_id = link.split('-')[-1]
-            
-            data.append({
-                "id": item_id,
-                "time_scrap": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "nombre": title,
-                "precio": price,
-                "url_articulo": link,
-                "municipio": item_config["filters"].get("municipio"),
-                "search_term": item_config["name"]
-            })
-        except Exception as e:
-            logger.debug(f"Error parsing item: {e}")
+    output_path, n_rows = checkpoint.finalize()
+    if output_path:
+        logger.info(f"Scraping finished. Saved {n_rows} items to {output_path}")
+    else:
+        logger.warning("No data scraped.")
+
+def save_step1_output(all_dfs):
+    """Writes the merged step1 DataFrames to data/step1/raw_<timestamp>.csv."""
+    if all_dfs:
+        final_df = pd.concat(all_dfs, ignore_index=True)
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M")
+        output_path = DATA_DIR / "step1" / f"raw_{timestamp}.csv"
+        
+        # Ensure folder exists
+        output_path.parent.mkdir(parents=True, exist_ok=True)
+        
+        final_df.to_csv(output_path, index=False)
+        logger.info(f"Scraping finished. Saved {len(final_df)} items to {output_path}")
+    else:
+        logger.warning("No data scraped.")
+
+def run_replay(snapshot_dir):
+    """
+    Step 1 without a browser: parses saved search snapshots (see `snapshot_stem`)
+    from `snapshot_dir` and writes the usual raw CSV, so the rest of the pipeline
+    can run over historical pages.
+    """
+    from .snapshot_parser import parse_snapshot, match_search_item
+
+    files = sorted(Path(snapshot_dir).glob("*.html"))
+    if not files:
+        raise Exception(f"No HTML snapshots found in {snapshot_dir}")
+
+    all_dfs = []
+    for path in files:
+        item = match_search_item(path)
+        if item is None:
+            logger.warning(f"Skipping {path.name}: no search item matches its name.")
             continue
-            
-    return pd.DataFrame(data)
+        df = parse_snapshot(path, item)
+        logger.info(f"Replayed {path.name}: {len(df)} items ({item_label(item)})")
+        all_dfs.append(df)
 
-def run_scraper():
-    driver = setup_driver()
-    try:
-        all_dfs = []
-        for item in CONFIG["search_items"]:
-            logger.info(f"Scraping item: {item['name']}")
-            
-            # No Retry logic: Fail fast as requested
-            try:
-                df = scrape_item(driver, item)
-                all_dfs.append(df)
-            except Exception as e:
-                logger.error(f"Error scraping {item['name']}: {e}")
-                raise e
-            
-        if all_dfs:
-            final_df = pd.concat(all_dfs, ignore_index=True)
-            timestamp = datetime.now().strftime("%Y%m%d_%H%M")
-            output_path = DATA_DIR / "step1" / f"raw_{timestamp}.csv"
-            
-            # Ensure folder exists
-            output_path.parent.mkdir(parents=True, exist_ok=True)
-            
-            final_df.to_csv(output_path, index=False)
-            logger.info(f"Scraping finished. Saved {len(final_df)} items to {output_path}")
-        else:
-            logger.warning("No data scraped.")
-            
-    finally:
-        driver.quit()
+    if all_dfs:
+        # The same listing may appear in several historical snapshots: keep the latest,
+        # and every city that found it (as in a live run)
+        merged = pd.concat(all_dfs, ignore_index=True)
+        merged = merge_listings(merged.sort_values("time_scrap", ascending=False, kind="stable"))
+        all_dfs = [merged]
+
+    save_step1_output(all_dfs)
 
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
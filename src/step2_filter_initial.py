@@ -1,11 +1,199 @@
 import logging
+import re
+import numpy as np
 import pandas as pd
-from pathlib import Path
 from .config import DATA_DIR, CONFIG
+from .filter_rules import TOKEN_PATTERN, get_rule_set
 # from .tracker import load_tracker, update_tracker, get_existing_ids, mark_as_filtered
 
 logger = logging.getLogger(__name__)
 
+# filter_code of each rule, in the order they are checked
+REASON_CODES = [
+    "ok",
+    "empty_title",
+    "config_not_found",
+    "no_tokens",
+    "first_char_digit",
+    "first_word_excluded",
+    "excluded_term",
+    "missing_tokens",
+    "price_too_low",
+    "price_too_high",
+]
+
+def parse_price(raw_price):
+    """Price from a string like "1.200 €" or "10,50 €" (None if it cannot be parsed, e.g. "A convenir")."""
+    # Remove '€' and '.' (thousands), replace ',' with '.' (decimal)
+    clean_price = raw_price.replace("€", "").replace(".", "").replace(",", ".").strip()
+    # Handle empty string if price was just symbol
+    if not clean_price: 
+        clean_price = "0"
+    try:
+        return float(clean_price)
+    except ValueError:
+        return None
+
+def check_filter(row):
+    """
+    Per-row reference of the step 2 rules (Legacy Logic Replication): (is_ok, reason).
+    `apply_filters` runs the same rules over a whole frame.
+    """
+    title = str(row.get("nombre", "")).lower()
+    search_term = str(row.get("search_term", "")).lower()
+    
+    if not title or title == "no title":
+        return False, "Empty or invalid title"
+
+    # Find config for this search term
+    item_config = next((item for item in CONFIG["search_items"] if item["name"].lower() == search_term), None)
+    
+    if not item_config:
+        return False, "Config not found"
+
+    tokens_list = re.findall(TOKEN_PATTERN, title)
+    if not tokens_list:
+         return False, "No tokens found"
+         
+    title_tokens = set(tokens_list)
+    first_token = tokens_list[0].lower()
+
+    # Keyword lists, required tokens and price bounds, compiled once per search term
+    rules = get_rule_set(item_config)
+
+    # 1. Start Exclusion (First word only)
+    if first_token[0].isdigit():
+         return False, f"First char is digit: {first_token}"
+
+    if first_token in rules.start_exclude_keywords:
+         return False, f"First word excluded: {first_token}"
+
+    # 2. General Exclusion (Anywhere)
+    # Intersection: if any excluded word appears in title tokens
+    common_exclusions = title_tokens.intersection(rules.exclude_keywords)
+    if common_exclusions:
+        return False, f"Excluded term found: {common_exclusions}"
+
+    # 2. Check Inclusion (Token based)
+    # We will require ALL tokens of the search term to be in the title tokens.
+    if not rules.required_tokens.issubset(title_tokens):
+        missing = rules.required_tokens - title_tokens
+        return False, f"Missing required tokens: {missing}"
+    
+    # 3. Check Price
+    price_val = parse_price(str(row.get("precio", "0")))
+    if price_val is not None:
+        if price_val < rules.min_price:
+             return False, f"Price too low: {price_val} < {rules.min_price}"
+        if rules.max_price is not None and price_val > rules.max_price:
+             return False, f"Price too high: {price_val} > {rules.max_price}"
+
+    return True, "OK"
+
+def _text_column(df, column, default):
+    """str() of every value, like `str(row.get(column, default))` (astype(str) may keep NaN)."""
+    if column not in df.columns:
+        return pd.Series(default, index=df.index, dtype=object)
+    return df[column].map(str)
+
+def apply_filters(df):
+    """
+    `check_filter` over the whole frame at once: same rules, same order, same reason texts.
+    Token rules work on the exploded (row, token) table, so each search term's rules
+    (`filter_rules.RuleSet`) are matched with `isin` instead of one set operation per row.
+    Returns (codes, reasons): Series aligned with `df`, code "ok" / reason "OK" for kept rows.
+    """
+    n = len(df)
+    codes = np.full(n, "ok", dtype=object)
+    reasons = np.full(n, "OK", dtype=object)
+    pending = np.ones(n, dtype=bool)
+    frame = pd.DataFrame({
+        "title": _text_column(df, "nombre", "").str.lower().to_numpy(),
+        "search_term": _text_column(df, "search_term", "").str.lower().to_numpy(),
+        "precio": _text_column(df, "precio", "0").to_numpy(),
+    })
+
+    def reject(mask, code, messages):
+        """Marks rows of `mask` not rejected by an earlier rule; messages: Series/array or callable(positions)."""
+        positions = np.flatnonzero(mask & pending)
+        if len(positions) == 0:
+            return
+        codes[positions] = code
+        reasons[positions] = messages(positions) if callable(messages) else np.asarray(messages, dtype=object)[positions]
+        pending[positions] = False
+
+    title = frame["title"]
+    reject(((title == "") | (title == "no title")).to_numpy(), "empty_title", np.full(n, "Empty or invalid title", dtype=object))
+
+    # First config with this name, as in the row-by-row lookup
+    configs = {}
+    for item in CONFIG["search_items"]:
+        configs.setdefault(item["name"].lower(), item)
+    reject((~frame["search_term"].isin(list(configs))).to_numpy(), "config_not_found", np.full(n, "Config not found", dtype=object))
+
+    tokens = pd.Series([[]] * n, dtype=object)
+    tokens[pending] = title[pending].str.findall(TOKEN_PATTERN)
+    reject((tokens.str.len() == 0).to_numpy(), "no_tokens", np.full(n, "No tokens found", dtype=object))
+
+    token_lists = tokens.to_numpy()
+    first = tokens.str[0].fillna("")
+    reject(first.str[0].str.isdigit().fillna(False).to_numpy(dtype=bool), "first_char_digit", "First char is digit: " + first)
+
+    # Long format: one (row, token) pair per token of every row still pending
+    exploded = tokens[pending].explode()
+    row_of_token = exploded.index.to_numpy()
+    token_values = exploded.to_numpy()
+
+    def rows_with_tokens(keywords, rows_mask):
+        hit = np.zeros(n, dtype=bool)
+        selected = rows_mask[row_of_token] & pd.Series(token_values).isin(keywords).to_numpy()
+        hit[row_of_token[selected]] = True
+        return hit
+
+    prices = None
+    for search_term, item_config in configs.items():
+        in_group = (frame["search_term"] == search_term).to_numpy() & pending
+        if not in_group.any():
+            continue
+        rules = get_rule_set(item_config)
+
+        # 1. Start Exclusion (First word only)
+        reject(in_group & first.isin(rules.start_exclude_keywords).to_numpy(), "first_word_excluded", "First word excluded: " + first)
+
+        # 2. General Exclusion (Anywhere): the message keeps the set repr of the row-by-row check
+        reject(
+            rows_with_tokens(rules.exclude_keywords, in_group & pending),
+            "excluded_term",
+            lambda positions: [f"Excluded term found: {set(token_lists[i]).intersection(rules.exclude_keywords)}" for i in positions],
+        )
+
+        # 2. Check Inclusion: ALL tokens of the search term in the title tokens
+        has_all = np.ones(n, dtype=bool)
+        for token in rules.required_tokens:
+            has_all &= rows_with_tokens([token], in_group & pending)
+        reject(
+            in_group & ~has_all,
+            "missing_tokens",
+            lambda positions: [f"Missing required tokens: {rules.required_tokens - set(token_lists[i])}" for i in positions],
+        )
+
+        # 3. Check Price: few distinct price strings, parse each once
+        if prices is None:
+            price_codes, price_strings = pd.factorize(frame["precio"])
+            parsed = np.array([parse_price(p) for p in price_strings] + [None], dtype=object)
+            prices = parsed[price_codes]
+        group_rows = np.flatnonzero(in_group & pending)
+        too_low = np.zeros(n, dtype=bool)
+        too_low[group_rows] = [p is not None and p < rules.min_price for p in prices[group_rows]]
+        reject(too_low, "price_too_low", lambda positions: [f"Price too low: {prices[i]} < {rules.min_price}" for i in positions])
+        if rules.max_price is not None:
+            group_rows = np.flatnonzero(in_group & pending)
+            too_high = np.zeros(n, dtype=bool)
+            too_high[group_rows] = [p is not None and p > rules.max_price for p in prices[group_rows]]
+            reject(too_high, "price_too_high", lambda positions: [f"Price too high: {prices[i]} > {rules.max_price}" for i in positions])
+
+    return pd.Series(codes, index=df.index), pd.Series(reasons, index=df.index)
+
 def run_initial_filter():
     """
     Step 2:
@@ -64,118 +252,16 @@ def run_initial_filter():
     # ---------------------------------------------------------
     # We need to map items back to their config rules. 
     # 'search_term' column in CSV helps us know which rule applied.
-    
-    included_rows = []
-    excluded_rows = []
-
-    import re
-
-    # Helper function to check keywords (Legacy Logic Replication)
-    def check_filter(row):
-        title = str(row.get("nombre", "")).lower()
-        search_term = str(row.get("search_term", "")).lower()
-        
-        if not title or title == "no title":
-            return False, "Empty or invalid title"
-
-        # Find config for this search term
-        item_config = next((item for item in CONFIG["search_items"] if item["name"].lower() == search_term), None)
-        
-        if not item_config:
-            return False, "Config not found"
-
-        # Updated logic: Split by non-alphanumeric characters AND split numbers from letters (e.g. "11pro" -> "11", "pro")
-        # This allows "iPhone 11pro" to match "iPhone 11"
-        tokens_list = re.findall(r'[a-zA-Z]+|\d+', title)
-        if not tokens_list:
-             return False, "No tokens found"
-             
-        title_tokens = set(tokens_list)
-        first_token = tokens_list[0].lower()
-
-        start_exclude_keywords = set()
-        exclude_keywords = set()
-
-        # Load blacklists from file if defined
-        if "blacklist_dir" in item_config:
-            blacklist_path = Path(item_config["blacklist_dir"])
-            
-            # First word blacklist
-            first_word_file = blacklist_path / "first_word_blacklist.txt"
-            if first_word_file.exists():
-                with open(first_word_file, "r", encoding="utf-8") as f:
-                    start_exclude_keywords = set(line.strip().lower() for line in f if line.strip())
-            
-            # Rest of words blacklist
-            rest_file = blacklist_path / "rest_of_words_blacklist.txt"
-            if rest_file.exists():
-                with open(rest_file, "r", encoding="utf-8") as f:
-                    exclude_keywords = set(line.strip().lower() for line in f if line.strip())
-            
-            # DEBUG
-            # print(f"DEBUG: Start Exclusions: {start_exclude_keywords}")
-        else:
-             # Fallback to config lists (legacy support or inline config)
-             start_exclude_keywords = set(k.lower() for k in item_config.get("start_exclude_keywords", []))
-             exclude_keywords = set(k.lower() for k in item_config.get("exclude_keywords", []))
-
-        # 1. Start Exclusion (First word only)
-        if first_token[0].isdigit():
-             return False, f"First char is digit: {first_token}"
-
-        if first_token in start_exclude_keywords:
-             return False, f"First word excluded: {first_token}"
-
-        # 2. General Exclusion (Anywhere)
-        # Intersection: if any excluded word appears in title tokens
-        common_exclusions = title_tokens.intersection(exclude_keywords)
-        if common_exclusions:
-            return False, f"Excluded term found: {common_exclusions}"
-
-        # 2. Check Inclusion (Token based)
-        # We will require ALL tokens of the search term to be in the title tokens.
-        required_tokens = set(re.findall(r'[a-zA-Z]+|\d+', search_term))
-        
-        if not required_tokens.issubset(title_tokens):
-            missing = required_tokens - title_tokens
-            return False, f"Missing required tokens: {missing}"
-        
-        # 3. Check Price
-        # Parse price from string like "1.200 €" or "10,50 €"
-        raw_price = str(row.get("precio", "0"))
-        try:
-            # Remove '€' and '.' (thousands), replace ',' with '.' (decimal)
-            clean_price = raw_price.replace("€", "").replace(".", "").replace(",", ".").strip()
-            # Handle empty string if price was just symbol
-            if not clean_price: 
-                clean_price = "0"
-                
-            price_val = float(clean_price)
-            
-            # Get min price from config (default 0 if not set)
-            min_price = item_config.get("filters", {}).get("precio_min", 0)
-            
-            if price_val < min_price:
-                 return False, f"Price too low: {price_val} < {min_price}"
-        except ValueError:
-            # If price cannot be parsed (e.g. "A convenir"), we default to keeping it 
-            # or could log a warning. For now, pass.
-            pass 
-
-        return True, "OK"
-
-    for _, row in df_new.iterrows():
-        is_ok, reason = check_filter(row)
-        if is_ok:
-            included_rows.append(row)
-        else:
-            # Add reason to row for debugging
-            row["filter_reason"] = reason
-            excluded_rows.append(row)
-
-    # Convert to DataFrames
-    df_inc = pd.DataFrame(included_rows) if included_rows else pd.DataFrame(columns=df_new.columns)
-    df_exc = pd.DataFrame(excluded_rows) if excluded_rows else pd.DataFrame(columns=df_new.columns)
+    # Rules run vectorized over the whole frame (see `apply_filters`); every row gets a filter_code.
+    codes, reasons = apply_filters(df_new)
+    keep = codes == "ok"
+    # Both outputs carry filter_code ("ok" for included rows); the reason text only for excluded ones
+    df_new = df_new.assign(filter_code=codes)
+    df_inc = df_new[keep]
+    df_exc = df_new[~keep].copy()
+    # Add reason to row for debugging
+    df_exc["filter_reason"] = reasons[~keep]
+    logger.info(f"Filter reasons: {codes.value_counts().to_dict()}")
 
     # ---------------------------------------------------------
     # Save to separate folders
@@ -183,7 +269,7 @@ def run_initial_filter():
     timestamp = latest_file.stem.replace("raw_", "")
 
     # Save Included
-    if included_rows:
+    if not df_inc.empty:
         dir_inc = DATA_DIR / "step2_inc"
         dir_inc.mkdir(parents=True, exist_ok=True)
         path_inc = dir_inc / f"filtered_{timestamp}.csv"
@@ -191,14 +277,14 @@ def run_initial_filter():
         logger.info(f"Saved {len(df_inc)} INCLUDED items to {path_inc}")
     
     # Save Excluded
-    if excluded_rows:
+    if not df_exc.empty:
         dir_exc = DATA_DIR / "step2_exc"
         dir_exc.mkdir(parents=True, exist_ok=True)
         path_exc = dir_exc / f"excluded_{timestamp}.csv"
         df_exc.to_csv(path_exc, index=False)
         logger.info(f"Saved {len(df_exc)} EXCLUDED items to {path_exc}")
 
-    if not included_rows and not excluded_rows:
+    if df_inc.empty and df_exc.empty:
          logger.info("All new items were processed but none saved? (Matches logic error)")
 
 if __name__ == "__main__":
@@ -2,7 +2,8 @@ import logging
 import pandas as pd
 from pathlib import Path
 from .config import DATA_DIR, BASE_DIR
-from .tracker import mark_as_filtered, update_tracker
+from .tracker import mark_filtered_bulk, update_tracker
+from .term_matcher import TermMatcher
 
 logger = logging.getLogger(__name__)
 
@@ -21,7 +22,7 @@ def run_business_logic_filter():
     1. Load latest from step 2 (filtered items).
     2. Apply Blacklist (exclude if title contains X).
     3. Apply Whitelist (include ONLY if title contains Y - if whitelist not empty).
-    4. Save to step 3.
+    4. Save to step 3 (excluded items, with the matching term, to step3_exc).
     """
     # Find latest file in step2
     step2_dir = DATA_DIR / "step2"
@@ -39,32 +40,40 @@ def run_business_logic_filter():
         logger.warning("Step 2 file is empty.")
         return
 
-    blacklist = load_list(BLACKLIST_PATH)
-    whitelist = load_list(WHITELIST_PATH)
+    # Each list is compiled once; a title is then scanned once per list, whatever its size
+    blacklist = TermMatcher(load_list(BLACKLIST_PATH))
+    whitelist = TermMatcher(load_list(WHITELIST_PATH))
     
     logger.info(f"Loaded {len(blacklist)} blacklist terms and {len(whitelist)} whitelist terms.")
 
     valid_items = []
+    excluded_items = []
+    outcomes = {} # id -> passed, written to the tracker in one go
     
     for _, row in df.iterrows():
         title = str(row.get("nombre", "")).lower()
         item_id = str(row["id"])
         
         # Check Blacklist
-        if any(term in title for term in blacklist):
-            logger.debug(f"Item {item_id} excluded by blacklist: {title}")
-            mark_as_filtered([item_id], stage=3, passed=False)
+        term = blacklist.first_match(title)
+        if term is not None:
+            logger.debug(f"Item {item_id} excluded by blacklist term '{term}': {title}")
+            outcomes[item_id] = False
+            excluded_items.append({**row.to_dict(), "filter_reason": "blacklist", "matched_term": term})
             continue
             
         # Check Whitelist (if stricter logic is needed)
         # Assuming whitelist is 'must contain at least one' if not empty
-        if whitelist and not any(term in title for term in whitelist):
+        if len(whitelist) and whitelist.first_match(title) is None:
             logger.debug(f"Item {item_id} excluded by whitelist: {title}")
-            mark_as_filtered([item_id], stage=3, passed=False)
+            outcomes[item_id] = False
+            excluded_items.append({**row.to_dict(), "filter_reason": "whitelist", "matched_term": None})
             continue
             
         valid_items.append(row)
-        mark_as_filtered([item_id], stage=3, passed=True)
+        outcomes[item_id] = True
+
+    mark_filtered_bulk(outcomes, stage=2) # Second filter stage: tracker column filter_2
         
     filtered_df = pd.DataFrame(valid_items)
     
@@ -77,6 +86,14 @@ def run_business_logic_filter():
     else:
         logger.info("Step 3 complete. No items remained after filtering.")
 
+    # Excluded items with the list and exact term that excluded them
+    if excluded_items:
+        timestamp = latest_file.stem.replace("filtered_", "")
+        exc_path = DATA_DIR / "step3_exc" / f"excluded_{timestamp}.csv"
+        exc_path.parent.mkdir(parents=True, exist_ok=True)
+        pd.DataFrame(excluded_items).to_csv(exc_path, index=False)
+        logger.info(f"Saved {len(excluded_items)} EXCLUDED items to {exc_path}")
+
 if __name__ == "__main__":
     logging.basicConfig(level=logging.INFO)
     run_business_logic_filter()
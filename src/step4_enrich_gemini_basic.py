@@ -64,6 +64,7 @@ def run_gemini_enrichment():
     model = genai.GenerativeModel('gemini-1.5-flash')
     
     enriched_data = []
+    processed_ids = []
     
     for i, row in df.iterrows():
         item_id = str(row["id"])
@@ -79,8 +80,10 @@ def run_gemini_enrichment():
         row_dict = row.to_dict()
         row_dict.update(specs)
         enriched_data.append(row_dict)
-        
-        mark_as_ia_processed([item_id])
+        processed_ids.append(item_id)
+
+    # One tracker write for the whole batch
+    mark_as_ia_processed(processed_ids)
 
     enriched_df = pd.DataFrame(enriched_data)
     
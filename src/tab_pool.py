@@ -0,0 +1,178 @@
+"""
+Ventanas concurrentes dentro de un mismo Chrome para el Step 1.
+
+Casi todo el tiempo de una búsqueda se va esperando a que la página cargue la siguiente
+tanda de anuncios. Con `scraping.tabs_per_browser` > 1, cada navegador abre varias
+ventanas y reparte los search items entre ellas: en cada ventana el scroller in-page
+avanza por tramos en segundo plano (SCROLLER_START_SCRIPT) y el proceso las sondea por
+turnos (SCROLLER_STATUS_SCRIPT, que no consume el progreso; SCROLLER_POLL_SCRIPT solo al
+acabar cada tramo), así que mientras una espera su tanda las demás avanzan. Son ventanas
+y no pestañas: Chrome frena el scroll y los IntersectionObserver de las pestañas en
+segundo plano, mientras que cada ventana sigue siendo la pestaña visible de la suya.
+Es independiente de `scraping.workers` (número de navegadores): cada worker del pool
+abre sus propias ventanas, y todas comparten el mismo `PacingScheduler`.
+
+En este modo no se usan la captura de red ni el informe de recursos (el log de
+rendimiento de Chrome es común a todas las ventanas), y los tiempos por fase de
+`scrape_metrics` incluyen el tiempo dedicado a las otras ventanas.
+"""
+import logging
+import time
+
+from .config import CONFIG
+from . import pacing, resource_policy, result_cache
+from .page_scripts import SCROLLER_START_SCRIPT, SCROLLER_STATUS_SCRIPT, SCROLLER_POLL_SCRIPT, SCROLLER_STOP_SCRIPT
+from .scrape_metrics import ScrapeMetrics
+
+logger = logging.getLogger(__name__)
+
+def tabs_per_browser():
+    return max(1, int(CONFIG["scraping"].get("tabs_per_browser", 1)))
+
+class TabSearch:
+    """One search item in progress in one window."""
+
+    def __init__(self, key, item_config, tab, metrics):
+        self.key = key
+        self.item_config = item_config
+        self.tab = tab
+        self.metrics = metrics
+        self.page = None
+        self.progress = None
+
+def open_tabs(driver, n_tabs):
+    """
+    Window handles of `n_tabs` windows (the current one first), each with the resource policy.
+    Separate windows rather than tabs: background tabs get their scrolling and
+    IntersectionObserver callbacks throttled, which stalls their scroller.
+    """
+    handles = [driver.current_window_handle]
+    while len(handles) < n_tabs:
+        driver.switch_to.new_window("window")
+        resource_policy.apply_resource_policy(driver) # Blocked URLs are per window (CDP target)
+        handles.append(driver.current_window_handle)
+    logger.info(f"Opened {len(handles)} windows in this browser.")
+    return handles
+
+def start_chunk(driver, search):
+    """Starts the next chunk of in-page scrolls in the current window and returns at once."""
+    from .step1_scraper import CARD_SELECTOR, async_scroller_config, scroller_options, mark_pruning
+
+    chunk = max(1, async_scroller_config().get("chunk_scrolls", 5))
+    pacing.acquire("scroll", chunk) # A token per scroll of the chunk, shared by every window and browser
+    options = scroller_options(search.progress)
+    mark_pruning(search.progress, options)
+    driver.execute_script(SCROLLER_START_SCRIPT, CARD_SELECTOR, options, chunk)
+
+def start_search(driver, key, item_config, tab):
+    """Opens the search in the current window and starts its scroller; returns a TabSearch."""
+    from .step1_scraper import ScrollProgress, open_search, item_label
+
+    logger.info(f"[tab {tab}] Scraping item: {item_label(item_config)}")
+    search = TabSearch(key, item_config, tab, ScrapeMetrics(item_config, driver=driver))
+    search.metrics.set("tab", tab)
+    try:
+        search.page = open_search(driver, item_config, search.metrics, network=False)
+        search.page["use_scroller"] = True # Windows only run concurrently with the in-page scroller
+        search.progress = ScrollProgress(CONFIG["scraping"].get("scrolls", 25))
+        start_chunk(driver, search)
+    except Exception as e:
+        search.metrics.finish("error", e)
+        raise
+    return search
+
+def poll_search(driver, search):
+    """
+    Checks the scroller of the current window. Starts its next chunk if it should keep going;
+    once it stops, finishes the search and returns its DataFrame (None while running).
+    """
+    from .step1_scraper import apply_scroller_report, scroll_fallback, finish_search
+
+    # Status only while the chunk runs: report() hands out the new ids once, so it is
+    # only called when the chunk has finished
+    status = driver.execute_script(SCROLLER_STATUS_SCRIPT)
+    if status is None:
+        raise Exception("In-page scroller not found in window (page navigated away?)")
+    if status["running"]:
+        return None
+    report = driver.execute_script(SCROLLER_POLL_SCRIPT)
+
+    scrolled_in_page = True
+    try:
+        stop = apply_scroller_report(driver, search.metrics, search.progress, report)
+    except Exception as e:
+        logger.warning(f"[tab {search.tab}] In-page scroller failed: {e}. Falling back to Python scrolling.")
+        try:
+            driver.execute_script(SCROLLER_STOP_SCRIPT, "fallback")
+        except Exception:
+            pass
+        stop, scrolled_in_page = True, False
+    if not stop:
+        start_chunk(driver, search)
+        return None
+
+    # Python fallbacks block the other windows, but only run when the scroller could not finish
+    scrolled_in_page = scroll_fallback(driver, search.metrics, search.progress, scrolled_in_page)
+    df = finish_search(driver, search.item_config, search.metrics, search.page, search.progress, scrolled_in_page)
+    search.metrics.count("cards_extracted", len(df))
+    search.metrics.finish()
+    result_cache.put(search.item_config, df)
+    return df
+
+def run_tabs(driver, next_task, on_done, on_error, n_tabs=None):
+    """
+    Scrapes search items in `n_tabs` windows of `driver`, polling their scrollers round-robin.
+
+    next_task(block) returns the next (key, item_config) or None if there is nothing to
+    start now; block=True means every window is idle, and None then ends the run.
+    on_done(key, item_config, df) and on_error(key, item_config, exc) are called as items
+    finish (on_done may make next_task return more items); on_error may raise to stop.
+    """
+    handles = open_tabs(driver, n_tabs or tabs_per_browser())
+    poll_seconds = CONFIG["scraping"].get("tab_poll_seconds", 0.5)
+    active = {}
+
+    def fail(handle, key, item_config, metrics, exc):
+        active.pop(handle, None)
+        if metrics is not None:
+            metrics.finish("error", exc)
+        on_error(key, item_config, exc)
+
+    while True:
+        # 1. Give every idle window a search item
+        for tab, handle in enumerate(handles):
+            while handle not in active:
+                task = next_task(not active)
+                if task is None:
+                    break
+                key, item_config = task
+                driver.switch_to.window(handle)
+                cached = result_cache.get(item_config)
+                if cached is not None:
+                    on_done(key, item_config, cached)
+                    continue
+                try:
+                    active[handle] = start_search(driver, key, item_config, tab)
+                except Exception as e:
+                    fail(handle, key, item_config, None, e)
+            if handle not in active:
+                break
+        if not active:
+            return
+
+        # 2. One round over the windows: finished chunks get checked and restarted
+        progressed = False
+        for handle, search in list(active.items()):
+            driver.switch_to.window(handle)
+            try:
+                df = poll_search(driver, search)
+            except Exception as e:
+                fail(handle, search.key, search.item_config, search.metrics, e)
+                progressed = True
+                continue
+            if df is not None:
+                del active[handle]
+                on_done(search.key, search.item_config, df)
+                progressed = True
+        if not progressed:
+            time.sleep(poll_seconds)
@@ -0,0 +1,82 @@
+"""
+Búsqueda de muchos términos a la vez (Aho-Corasick) para las listas del Step 3.
+
+`any(term in title for term in blacklist)` recorre el título una vez por término, así que
+el coste crece con filas × términos. `TermMatcher` compila los términos una sola vez en
+un autómata (trie con enlaces de fallo) y encuentra todos los que aparecen en un título
+con una sola pasada, sin dependencias externas. Las coincidencias son de subcadena, igual
+que `term in title`.
+"""
+
+class TermMatcher:
+    """Aho-Corasick automaton over a fixed list of terms."""
+
+    def __init__(self, terms):
+        self.terms = list(terms)
+        # Node 0 is the root; goto[node] maps a character to the next node
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+        for index, term in enumerate(self.terms):
+            if term:
+                self._add(term, index)
+        self._link()
+
+    def __len__(self):
+        return len(self.terms)
+
+    def _add(self, term, index):
+        node = 0
+        for ch in term:
+            next_node = self._goto[node].get(ch)
+            if next_node is None:
+                next_node = len(self._goto)
+                self._goto[node][ch] = next_node
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+            node = next_node
+        self._out[node] = self._out[node] + (index,)
+
+    def _link(self):
+        """
+        Failure links by BFS, then folds them into the transitions (a DFA): matching costs
+        one dict lookup per character. Each node also outputs the terms of its failure chain.
+        """
+        queue = list(self._goto[0].values())
+        for node in queue:
+            for ch, child in self._goto[node].items():
+                fallback = self._fail[node]
+                while fallback and ch not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(ch, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+                queue.append(child)
+
+        # Transitions back to the root are left out: missing key -> node 0
+        self._delta = [dict(self._goto[0])] + [None] * (len(self._goto) - 1)
+        for node in queue:
+            moves = dict(self._delta[self._fail[node]])
+            moves.update(self._goto[node])
+            self._delta[node] = moves
+
+    def match_indexes(self, text):
+        """Indexes (in `terms`) of every term found in `text`, in one pass."""
+        delta, out = self._delta, self._out
+        found = set()
+        node = 0
+        for ch in text:
+            node = delta[node].get(ch, 0)
+            if out[node]:
+                found.update(out[node])
+        return found
+
+    def matches(self, text):
+        """Terms found in `text`, in list order."""
+        return [self.terms[i] for i in sorted(self.match_indexes(text))]
+
+    def first_match(self, text):
+        """First term of the list found in `text` (what the linear `any` scan stops at), or None."""
+        found = self.match_indexes(text)
+        return self.terms[min(found)] if found else None
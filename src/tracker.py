@@ -1,38 +1,184 @@
-import pandas as pd
+"""
+Tracker global de anuncios sobre SQLite.
+
+Cada anuncio visto es una fila de `tracker` (clave primaria `id`, índices en
+`t_last_scrap` y en los flags de filtro/IA), en `data/global_tracker.db` en modo WAL:
+las consultas de pertenencia y las actualizaciones van por índice en lugar de leer y
+reescribir un CSV entero. La primera vez que se abre, la base se rellena con el antiguo
+`global_tracker.csv` (migración única); `export_csv` vuelve a escribir ese CSV para las
+herramientas que lo leen.
+
+    uv run python -m src.tracker export [ruta.csv]
+    uv run python -m src.tracker migrate [ruta.csv]
+"""
+import argparse
+import logging
+import sqlite3
+from contextlib import contextmanager
 from datetime import datetime
-import os
-from .config import GLOBAL_TRACKER_PATH
+
+import pandas as pd
+from .config import GLOBAL_TRACKER_PATH, GLOBAL_TRACKER_DB_PATH
+
+logger = logging.getLogger(__name__)
 
 COLUMNS = [
-    "id", 
-    "t_first_scrap", 
-    "t_last_scrap", 
-    "filter_1", 
-    "filter_2", 
+    "id",
+    "t_first_scrap",
+    "t_last_scrap",
+    "filter_1",
+    "filter_2",
     "ia_processed"
 ]
 
+FLAG_COLUMNS = ["filter_1", "filter_2", "ia_processed"]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tracker (
+    id TEXT PRIMARY KEY,
+    t_first_scrap TEXT,
+    t_last_scrap TEXT,
+    filter_1 INTEGER NOT NULL DEFAULT 0,
+    filter_2 INTEGER NOT NULL DEFAULT 0,
+    ia_processed INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS idx_tracker_t_last_scrap ON tracker (t_last_scrap);
+CREATE INDEX IF NOT EXISTS idx_tracker_filter_1 ON tracker (filter_1);
+CREATE INDEX IF NOT EXISTS idx_tracker_filter_2 ON tracker (filter_2);
+CREATE INDEX IF NOT EXISTS idx_tracker_ia_processed ON tracker (ia_processed);
+CREATE TABLE IF NOT EXISTS tracker_meta (key TEXT PRIMARY KEY, value TEXT);
+"""
+
+# SQLite limits the number of parameters per statement
+IN_CHUNK = 500
+
+_initialized = set()
+
+@contextmanager
+def connect():
+    """Connection to the tracker database (one transaction, committed on exit)."""
+    db_path = GLOBAL_TRACKER_DB_PATH
+    first_use = str(db_path) not in _initialized
+    if first_use:
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+    # Pool workers and later steps may open it concurrently: wait for locks instead of failing
+    conn = sqlite3.connect(db_path, timeout=30)
+    try:
+        if first_use:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+            _initialized.add(str(db_path))
+            _migrate_once(conn)
+        with conn:
+            yield conn
+    finally:
+        conn.close()
+
+def _migrate_once(conn):
+    """Imports the legacy CSV tracker the first time the database is opened."""
+    done = conn.execute("SELECT value FROM tracker_meta WHERE key = 'csv_migrated'").fetchone()
+    if done:
+        return
+    with conn:
+        if GLOBAL_TRACKER_PATH.exists():
+            n_rows = _import_csv(conn, GLOBAL_TRACKER_PATH)
+            logger.info(f"Migrated {n_rows} tracker rows from {GLOBAL_TRACKER_PATH} to {GLOBAL_TRACKER_DB_PATH}.")
+        conn.execute(
+            "INSERT OR REPLACE INTO tracker_meta (key, value) VALUES ('csv_migrated', ?)",
+            (datetime.now().strftime("%Y-%m-%d %H:%M:%S"),),
+        )
+
+def _as_flag(value):
+    if isinstance(value, str):
+        return int(value.strip().lower() in ("true", "1"))
+    return int(bool(value)) if pd.notna(value) else 0
+
+def _import_csv(conn, csv_path):
+    df = pd.read_csv(csv_path, dtype={"id": str})
+    for col in COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    rows = [
+        (
+            str(row.id),
+            row.t_first_scrap if pd.notna(row.t_first_scrap) else None,
+            row.t_last_scrap if pd.notna(row.t_last_scrap) else None,
+            _as_flag(row.filter_1),
+            _as_flag(row.filter_2),
+            _as_flag(row.ia_processed),
+        )
+        for row in df[COLUMNS].itertuples(index=False)
+    ]
+    # Existing rows win: the CSV is older than anything already in the database
+    conn.executemany(
+        "INSERT OR IGNORE INTO tracker (id, t_first_scrap, t_last_scrap, filter_1, filter_2, ia_processed) VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+    return len(rows)
+
+def migrate_csv(csv_path=GLOBAL_TRACKER_PATH):
+    """Imports a tracker CSV into the database (ids already present are kept)."""
+    with connect() as conn:
+        n_rows = _import_csv(conn, csv_path)
+    logger.info(f"Imported {n_rows} tracker rows from {csv_path}.")
+    return n_rows
+
 def load_tracker():
-    """Loads the global tracker CSV."""
-    if not os.path.exists(GLOBAL_TRACKER_PATH):
-        return pd.DataFrame(columns=COLUMNS)
-    return pd.read_csv(GLOBAL_TRACKER_PATH, dtype={"id": str})
+    """Loads the whole global tracker as a DataFrame."""
+    with connect() as conn:
+        df = pd.read_sql_query(f"SELECT {', '.join(COLUMNS)} FROM tracker", conn)
+    for col in FLAG_COLUMNS:
+        df[col] = df[col].astype(bool)
+    return df
 
 def save_tracker(df):
-    """Saves the global tracker CSV."""
-    df.to_csv(GLOBAL_TRACKER_PATH, index=False)
+    """Replaces the global tracker with `df`."""
+    with connect() as conn:
+        conn.execute("DELETE FROM tracker")
+        _insert_frame(conn, df)
+
+def _insert_frame(conn, df):
+    df = df.copy()
+    for col in COLUMNS:
+        if col not in df.columns:
+            df[col] = None
+    rows = [
+        (str(row.id), row.t_first_scrap, row.t_last_scrap, _as_flag(row.filter_1), _as_flag(row.filter_2), _as_flag(row.ia_processed))
+        for row in df[COLUMNS].itertuples(index=False)
+    ]
+    conn.executemany(
+        "INSERT OR REPLACE INTO tracker (id, t_first_scrap, t_last_scrap, filter_1, filter_2, ia_processed) VALUES (?, ?, ?, ?, ?, ?)",
+        rows,
+    )
+
+def export_csv(csv_path=GLOBAL_TRACKER_PATH):
+    """Writes the tracker in the legacy CSV format (for tools that still read the CSV)."""
+    df = load_tracker()
+    df.to_csv(csv_path, index=False)
+    logger.info(f"Exported {len(df)} tracker rows to {csv_path}.")
+    return csv_path
 
 def get_existing_ids():
     """Returns a set of all article IDs in the tracker."""
-    df = load_tracker()
-    return set(df["id"].tolist())
+    with connect() as conn:
+        return {row[0] for row in conn.execute("SELECT id FROM tracker")}
+
+def known_ids(ids):
+    """Subset of `ids` already in the tracker (primary key lookups, no full scan)."""
+    ids = list({str(item_id) for item_id in ids})
+    found = set()
+    with connect() as conn:
+        for start in range(0, len(ids), IN_CHUNK):
+            chunk = ids[start:start + IN_CHUNK]
+            placeholders = ", ".join("?" * len(chunk))
+            found.update(row[0] for row in conn.execute(f"SELECT id FROM tracker WHERE id IN ({placeholders})", chunk))
+    return found
 
 def update_tracker(new_data):
     """
     Updates the tracker with new articles or updates timestamps for existing ones.
     new_data: DataFrame or list of dicts with 'id'.
     """
-    df = load_tracker()
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
 
     # Ensure new_data is a DataFrame
@@ -44,46 +190,52 @@ def update_tracker(new_data):
     if new_df.empty:
         return
 
-    new_df["id"] = new_df["id"].astype(str)
-
-    # Separate new vs existing
-    existing_ids = set(df["id"])
-    new_articles = new_df[~new_df["id"].isin(existing_ids)].copy()
-    seen_articles_ids = new_df[new_df["id"].isin(existing_ids)]["id"].tolist()
-
-    # Add new articles
-    if not new_articles.empty:
-        new_articles["t_first_scrap"] = current_time
-        new_articles["t_last_scrap"] = current_time
-        new_articles["filter_1"] = False # Default
-        new_articles["filter_2"] = False # Default
-        new_articles["ia_processed"] = False # Default
-        
-        # Keep only relevant columns
-        for col in COLUMNS:
-            if col not in new_articles.columns:
-                new_articles[col] = False if "filter" in col or "ia" in col else None
-                if col == "t_last_scrap" or col == "t_first_scrap":
-                     new_articles[col] = current_time
-        
-        df = pd.concat([df, new_articles[COLUMNS]], ignore_index=True)
-
-    # Update timestamp for seen articles
-    if seen_articles_ids:
-        df.loc[df["id"].isin(seen_articles_ids), "t_last_scrap"] = current_time
-
-    save_tracker(df)
+    ids = new_df["id"].astype(str).drop_duplicates()
+    # Upsert: new articles start with every flag False, seen ones only refresh t_last_scrap
+    with connect() as conn:
+        conn.executemany(
+            "INSERT INTO tracker (id, t_first_scrap, t_last_scrap) VALUES (?, ?, ?) "
+            "ON CONFLICT(id) DO UPDATE SET t_last_scrap = excluded.t_last_scrap",
+            [(item_id, current_time, current_time) for item_id in ids],
+        )
+
+def set_statuses(column, statuses):
+    """
+    Bulk update: `statuses` maps id -> new value of `column` (e.g. {"123": True}).
+    One transaction however many ids; ids not in the tracker are ignored.
+    """
+    if column not in FLAG_COLUMNS:
+        raise ValueError(f"Unknown tracker column '{column}' (expected one of {FLAG_COLUMNS})")
+    if not statuses:
+        return
+    with connect() as conn:
+        conn.executemany(
+            f"UPDATE tracker SET {column} = ? WHERE id = ?",
+            [(_as_flag(value), str(item_id)) for item_id, value in statuses.items()],
+        )
+
+def mark_filtered_bulk(statuses, stage=1):
+    """
+    Records filter outcomes of a whole stage: `statuses` maps id -> passed (bool).
+    Stage 1 is the initial filter (step 2), stage 2 the business logic filter (step 3).
+    """
+    set_statuses(f"filter_{stage}", statuses)
 
 def mark_as_filtered(ids, stage=1, passed=True):
     """Marks articles as passing or failing a filter stage."""
-    df = load_tracker()
-    col = f"filter_{stage}"
-    if col in df.columns:
-        df.loc[df["id"].isin(ids), col] = passed
-        save_tracker(df)
+    mark_filtered_bulk({item_id: passed for item_id in ids}, stage=stage)
 
 def mark_as_ia_processed(ids):
     """Marks articles as having been processed by IA."""
-    df = load_tracker()
-    df.loc[df["id"].isin(ids), "ia_processed"] = True
-    save_tracker(df)
+    set_statuses("ia_processed", {item_id: True for item_id in ids})
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description="Global tracker maintenance")
+    parser.add_argument("command", choices=["export", "migrate"], help="export: database -> CSV; migrate: CSV -> database")
+    parser.add_argument("csv_path", nargs="?", default=str(GLOBAL_TRACKER_PATH))
+    args = parser.parse_args()
+    if args.command == "export":
+        export_csv(args.csv_path)
+    else:
+        migrate_csv(args.csv_path)
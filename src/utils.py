@@ -1,3 +1,8 @@
+import re
+
+def slugify(text):
+    """File-name friendly version of a search term ("iphone 16" -> "iphone_16")."""
+    return re.sub(r"\W+", "_", str(text).lower()).strip("_")
 
 CITY_COORDINATES = {
     "Madrid": [-3.7003454, 40.4166909],
@@ -0,0 +1,126 @@
+"""
+Arranque en caliente de Chrome para el Step 1.
+
+Evita el coste fijo de cada ejecución:
+1.  **Driver parcheado en caché**: el chromedriver parcheado por `undetected_chromedriver`
+    se guarda por versión mayor de Chrome y se reutiliza (sin descarga ni re-parcheo).
+2.  **Perfil persistente**: un `user-data-dir` reutilizable que conserva el consentimiento
+    de cookies, de modo que el banner de OneTrust no vuelve a aparecer.
+3.  **Lista de User-Agents en caché**: evita construir la base de datos de `fake_useragent`
+    en cada arranque.
+
+Todo vive en `scraping.warm_start.cache_dir` (fuera de `data/`, que se commitea en CI).
+"""
+import json
+import logging
+import os
+import random
+import re
+import shutil
+import subprocess
+import time
+
+from .config import CONFIG, BASE_DIR
+
+logger = logging.getLogger(__name__)
+
+def warm_config():
+    return CONFIG["scraping"].get("warm_start", {})
+
+def is_enabled():
+    return bool(warm_config().get("enabled", False))
+
+def cache_dir():
+    path = BASE_DIR / warm_config().get("cache_dir", ".cache/wallascrap")
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def profile_dir(worker_idx=None):
+    """Persistent Chrome profile (one per pool worker, never shared)."""
+    name = "chrome_profile" if worker_idx is None else f"chrome_profile_w{worker_idx}"
+    path = cache_dir() / name
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+def get_chrome_major_version():
+    """Major version of the installed Chrome, or None if it cannot be determined."""
+    try:
+        import undetected_chromedriver as uc
+        exe = uc.find_chrome_executable()
+        if not exe:
+            return None
+        output = subprocess.run([exe, "--version"], capture_output=True, text=True, timeout=10).stdout
+        match = re.search(r"(\d+)\.\d+", output)
+        return int(match.group(1)) if match else None
+    except Exception as e:
+        logger.warning(f"Could not detect Chrome version: {e}")
+        return None
+
+def cached_driver_path(version_main):
+    """Path of the cached patched chromedriver for this Chrome version (if present)."""
+    if not version_main:
+        return None
+    path = cache_dir() / f"chromedriver_{version_main}"
+    return path if path.exists() else None
+
+def store_patched_driver(driver, version_main):
+    """Copies the chromedriver that uc just patched into the cache."""
+    if not version_main:
+        return
+    try:
+        source = driver.patcher.executable_path
+        target = cache_dir() / f"chromedriver_{version_main}"
+        if not target.exists():
+            shutil.copy2(source, target)
+            logger.info(f"Cached patched chromedriver for Chrome {version_main} at {target}")
+    except Exception as e:
+        logger.warning(f"Could not cache patched chromedriver: {e}")
+
+def random_user_agent():
+    """Random UA from a cached list (rebuilt every `ua_cache_days`)."""
+    path = cache_dir() / "user_agents.json"
+    max_age = warm_config().get("ua_cache_days", 7) * 86400
+
+    agents = []
+    if path.exists() and time.time() - path.stat().st_mtime < max_age:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                agents = json.load(f)
+        except Exception as e:
+            logger.warning(f"Corrupt UA cache, rebuilding: {e}")
+
+    if not agents:
+        from fake_useragent import UserAgent
+        ua = UserAgent()
+        agents = sorted({ua.random for _ in range(200)})
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(agents, f, indent=1)
+        logger.info(f"Cached {len(agents)} user agents at {path}")
+
+    return random.choice(agents)
+
+def cached_std_driver(version_main, install):
+    """
+    Path of the standard (non-uc) chromedriver for this Chrome version.
+    `install()` (ChromeDriverManager, with its online version check) only runs on a cache miss.
+    """
+    path = cache_dir() / "std_chromedriver.json"
+    cache = {}
+    if path.exists():
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except Exception:
+            cache = {}
+
+    key = str(version_main)
+    cached = cache.get(key)
+    if version_main and cached and os.path.exists(cached):
+        return cached
+
+    driver_path = install()
+    if version_main:
+        cache[key] = driver_path
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(cache, f, indent=1)
+    return driver_path
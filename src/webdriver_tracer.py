@@ -0,0 +1,103 @@
+"""
+Contador de comandos WebDriver.
+
+Envuelve `driver.execute`, el punto por el que pasa todo comando que Selenium envía a
+chromedriver (execute_script, find_element, get_attribute, page_source...), para saber
+cuántos round-trips cuesta cada search item y cuánto tiempo se va en ellos. Los comandos
+se agrupan por tipo (`command_type`); `ScrapeMetrics` guarda la diferencia por item y la
+muestra como histograma, para separar el coste de WebDriver del trabajo de la página.
+"""
+import logging
+import time
+from collections import Counter
+
+logger = logging.getLogger(__name__)
+
+# Selenium command names (legacy and W3C) -> type shown in the histogram
+COMMAND_TYPES = {
+    "executeScript": "execute_script",
+    "w3cExecuteScript": "execute_script",
+    "executeAsyncScript": "execute_async_script",
+    "w3cExecuteScriptAsync": "execute_async_script",
+    "findElement": "find_element",
+    "findElements": "find_element",
+    "findChildElement": "find_element",
+    "findChildElements": "find_element",
+    "getElementAttribute": "get_attribute",
+    "getElementProperty": "get_attribute",
+    "getPageSource": "page_source",
+    "screenshot": "screenshot",
+    "elementScreenshot": "screenshot",
+    "get": "navigate",
+    "executeCdpCommand": "cdp",
+}
+
+def command_type(driver_command, params=None):
+    """Histogram bucket of one WebDriver command."""
+    kind = COMMAND_TYPES.get(driver_command, driver_command)
+    # Selenium 4 implements get_attribute / is_displayed as injected atoms
+    if kind == "execute_script" and params:
+        script = params.get("script", "")
+        if script.startswith("/* getAttribute */"):
+            return "get_attribute"
+        if script.startswith("/* isDisplayed */"):
+            return "is_displayed"
+    return kind
+
+def instrument_driver(driver):
+    """Starts counting and timing the WebDriver commands sent by `driver`."""
+    if getattr(driver, "_wallascrap_commands", None) is not None:
+        return driver
+
+    counter = Counter()
+    seconds = Counter()
+    original_execute = driver.execute
+
+    def execute(driver_command, params=None):
+        kind = command_type(driver_command, params)
+        counter[kind] += 1
+        start = time.perf_counter()
+        try:
+            return original_execute(driver_command, params)
+        finally:
+            seconds[kind] += time.perf_counter() - start
+
+    driver.execute = execute
+    driver._wallascrap_commands = counter
+    driver._wallascrap_command_seconds = seconds
+    return driver
+
+def command_count(driver):
+    """Total WebDriver commands sent so far (0 if the driver is not instrumented)."""
+    counter = getattr(driver, "_wallascrap_commands", None)
+    return sum(counter.values()) if counter is not None else 0
+
+def command_stats(driver):
+    """{type: (count, seconds)} of the commands sent so far ({} if not instrumented)."""
+    counter = getattr(driver, "_wallascrap_commands", None)
+    if counter is None:
+        return {}
+    seconds = driver._wallascrap_command_seconds
+    return {kind: (n, seconds[kind]) for kind, n in counter.items()}
+
+def stats_since(driver, start_stats):
+    """Per-type {"count", "seconds"} of the commands sent since `command_stats` returned `start_stats`."""
+    delta = {}
+    for kind, (n, secs) in command_stats(driver).items():
+        n0, secs0 = start_stats.get(kind, (0, 0.0))
+        if n > n0:
+            delta[kind] = {"count": n - n0, "seconds": round(secs - secs0, 3)}
+    return delta
+
+def format_histogram(stats, total_seconds, width=30):
+    """Text histogram (one line per command type, bars by time) of `stats_since` output."""
+    if not stats:
+        return ""
+    rows = sorted(stats.items(), key=lambda kv: kv[1]["seconds"], reverse=True)
+    longest = max(s["seconds"] for s in stats.values()) or 1
+    lines = []
+    for kind, s in rows:
+        bar = "#" * max(1, round(width * s["seconds"] / longest)) if s["seconds"] else ""
+        share = 100 * s["seconds"] / total_seconds if total_seconds else 0
+        lines.append(f"  {kind:22} {s['count']:6d} {s['seconds']:8.2f}s {share:5.1f}%  {bar}")
+    return "\n".join(lines)
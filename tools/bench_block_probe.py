@@ -0,0 +1,56 @@
+"""
+Benchmark: comprobación de bloqueo con el probe in-page vs. la antigua (title + page_source).
+
+Carga páginas guardadas (resultados normales y, si las hay, páginas `blocked-*.html`) en
+Chrome y mide el coste por scroll de cada camino: tiempo, bytes que viajan por WebDriver y
+si ambos coinciden en el veredicto.
+
+Uso:
+    uv run python -m tools.bench_block_probe data/web-*.html data/blocked-*.html --repeat 5
+"""
+import argparse
+import json
+import logging
+from pathlib import Path
+
+from src.step1_scraper import setup_driver, check_for_block_legacy, CARD_SELECTOR
+from src.page_scripts import PAGE_PROBE_SCRIPT
+from tools.bench_utils import time_call
+
+logger = logging.getLogger(__name__)
+
+def probe(driver):
+    return driver.execute_script(PAGE_PROBE_SCRIPT, CARD_SELECTOR, 0)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark block detection paths on saved HTML files")
+    parser.add_argument("files", nargs="+", help="Saved HTML files (search results and/or block pages)")
+    parser.add_argument("--repeat", type=int, default=5, help="Repetitions per path (best time is reported)")
+    args = parser.parse_args()
+
+    driver = setup_driver()
+    try:
+        print(f"{'file':40} {'blocked':>7} {'probe (s)':>10} {'legacy (s)':>11} {'probe KB':>9} {'legacy KB':>10} {'speedup':>8}")
+        for file in args.files:
+            path = Path(file).resolve()
+            driver.get(path.as_uri())
+
+            t_probe, status = time_call(probe, driver, args.repeat)
+            t_legacy, legacy = time_call(check_for_block_legacy, driver, args.repeat)
+
+            if status["blocked"] != legacy["blocked"]:
+                logger.warning(f"{path.name}: probe={status['marker']} legacy={legacy['marker']}")
+
+            probe_kb = len(json.dumps(status)) / 1024
+            legacy_kb = len(driver.page_source) / 1024
+            speedup = t_legacy / t_probe if t_probe else float("inf")
+            print(
+                f"{path.name[:40]:40} {str(status['blocked']):>7} {t_probe:>10.4f} {t_legacy:>11.4f} "
+                f"{probe_kb:>9.1f} {legacy_kb:>10.1f} {speedup:>7.1f}x"
+            )
+    finally:
+        driver.quit()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
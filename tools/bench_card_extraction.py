@@ -0,0 +1,45 @@
+"""
+Benchmark: extracción de tarjetas in-page (un solo execute_script) vs. extracción por elemento.
+
+Carga páginas de resultados guardadas (p. ej. los `data/web-*.html` / `data/error_*.html`
+que genera `save_debug_html`) en Chrome y mide el tiempo de cada camino.
+
+Uso:
+    uv run python -m tools.bench_card_extraction data/web-*.html --repeat 3
+"""
+import argparse
+import logging
+from pathlib import Path
+
+from src.step1_scraper import setup_driver, extract_cards, extract_cards_legacy
+from tools.bench_utils import time_call
+
+logger = logging.getLogger(__name__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark card extraction paths on saved HTML files")
+    parser.add_argument("files", nargs="+", help="Saved search-results HTML files")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per path (best time is reported)")
+    args = parser.parse_args()
+
+    driver = setup_driver()
+    try:
+        print(f"{'file':40} {'cards':>6} {'in-page (s)':>12} {'legacy (s)':>12} {'speedup':>8}")
+        for file in args.files:
+            path = Path(file).resolve()
+            driver.get(path.as_uri())
+
+            t_fast, fast = time_call(extract_cards, driver, args.repeat)
+            t_slow, slow = time_call(extract_cards_legacy, driver, args.repeat)
+
+            if [c["id"] for c in fast] != [c["id"] for c in slow]:
+                logger.warning(f"{path.name}: both paths returned different ids!")
+
+            speedup = t_slow / t_fast if t_fast else float("inf")
+            print(f"{path.name[:40]:40} {len(fast):>6} {t_fast:>12.3f} {t_slow:>12.3f} {speedup:>7.1f}x")
+    finally:
+        driver.quit()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
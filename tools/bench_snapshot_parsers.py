@@ -0,0 +1,45 @@
+"""
+Benchmark de parsers de BeautifulSoup sobre snapshots HTML guardados (sin Chrome).
+
+Uso:
+    uv run python -m tools.bench_snapshot_parsers data/snapshots/*.html --repeat 3
+"""
+import argparse
+import importlib.util
+import time
+from pathlib import Path
+
+from src.snapshot_parser import parse_cards
+
+CANDIDATE_PARSERS = {
+    "html.parser": None,
+    "lxml": "lxml",
+    "html5lib": "html5lib",
+}
+
+def available_parsers():
+    return [name for name, module in CANDIDATE_PARSERS.items()
+            if module is None or importlib.util.find_spec(module) is not None]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark snapshot parsers")
+    parser.add_argument("files", nargs="+", help="Saved search-results HTML files")
+    parser.add_argument("--repeat", type=int, default=3, help="Repetitions per parser (best time is reported)")
+    args = parser.parse_args()
+
+    parsers = available_parsers()
+    print(f"{'file':40} {'parser':12} {'cards':>6} {'best (s)':>9}")
+    for file in args.files:
+        path = Path(file)
+        html = path.read_text(encoding="utf-8")
+        for name in parsers:
+            best = float("inf")
+            cards = []
+            for _ in range(args.repeat):
+                start = time.perf_counter()
+                cards = parse_cards(html, parser=name)
+                best = min(best, time.perf_counter() - start)
+            print(f"{path.name[:40]:40} {name:12} {len(cards):>6} {best:>9.3f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark: filtros del Step 2 fila a fila (`check_filter` + iterrows) vs. vectorizados (`apply_filters`).
+
+Genera DataFrames sintéticos con la forma del CSV del Step 1 (títulos mezclando términos de
+búsqueda, palabras de las blacklists, números y títulos vacíos; precios con formato "1.200 €")
+para los search items configurados, mide ambos caminos y comprueba que dan exactamente el
+mismo resultado (decisión y texto del motivo) en las filas evaluadas fila a fila.
+
+El camino fila a fila sigue recorriendo las filas con iterrows: por encima de `--legacy-max`
+filas solo se mide el vectorizado.
+
+Uso:
+    uv run python -m tools.bench_step2_filters --sizes 10000 100000 1000000 --legacy-max 100000
+"""
+import argparse
+import logging
+import random
+import time
+
+import pandas as pd
+
+from src.config import CONFIG
+from src.filter_rules import get_rule_set
+from src.step2_filter_initial import apply_filters, check_filter
+
+logger = logging.getLogger(__name__)
+
+FILLER_WORDS = ["pro", "max", "128gb", "256", "gb", "nuevo", "precintado", "azul", "negro", "libre", "garantia", "11pro", "plus"]
+PRICE_FORMATS = ["{} €", "{},50 €", "{}.000 €", "A convenir", "€", "{}"]
+
+def synthetic_frame(n_rows, seed=0):
+    """Step 1-like rows for the configured search items."""
+    rng = random.Random(seed)
+    items = CONFIG["search_items"]
+    vocab = {}
+    for item in items:
+        rules = get_rule_set(item)
+        vocab[item["name"]] = (sorted(rules.start_exclude_keywords) or ["funda"], sorted(rules.exclude_keywords) or ["pieza"])
+    rows = []
+    for i in range(n_rows):
+        item = rng.choice(items)
+        start_words, rest_words = vocab[item["name"]]
+        words = item["name"].split()
+        if rng.random() < 0.3:
+            words = words[:-1] # Missing a required token
+        words += rng.sample(FILLER_WORDS, rng.randint(0, 4))
+        if rng.random() < 0.15:
+            words.append(rng.choice(rest_words))
+        rng.shuffle(words)
+        if rng.random() < 0.1:
+            words.insert(0, rng.choice(start_words))
+        if rng.random() < 0.05:
+            words.insert(0, str(rng.randint(1, 20)))
+        title = " ".join(words).title()
+        if rng.random() < 0.01:
+            title = rng.choice(["", "No Title", "!!!"])
+        search_term = item["name"] if rng.random() > 0.01 else "otro producto"
+        price = rng.choice(PRICE_FORMATS).format(rng.randint(1, 1500))
+        rows.append({"id": str(i), "nombre": title, "precio": price, "search_term": search_term})
+    return pd.DataFrame(rows)
+
+def run_legacy(df):
+    return [check_filter(row) for _, row in df.iterrows()]
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark step 2 filters: row-by-row vs vectorized")
+    parser.add_argument("--sizes", nargs="+", type=int, default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--legacy-max", type=int, default=100_000, help="Largest size also run row by row (and checked)")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'row-by-row (s)':>15} {'vectorized (s)':>15} {'speedup':>8} {'kept':>8}  check")
+    for size in args.sizes:
+        df = synthetic_frame(size)
+
+        start = time.perf_counter()
+        codes, reasons = apply_filters(df)
+        t_vec = time.perf_counter() - start
+        kept = int((codes == "ok").sum())
+
+        if size > args.legacy_max:
+            print(f"{size:>10} {'-':>15} {t_vec:>15.3f} {'-':>8} {kept:>8}  skipped")
+            continue
+
+        start = time.perf_counter()
+        legacy = run_legacy(df)
+        t_legacy = time.perf_counter() - start
+
+        mismatches = [
+            i for i, (is_ok, reason) in enumerate(legacy)
+            if is_ok != (codes.iat[i] == "ok") or reason != reasons.iat[i]
+        ]
+        for i in mismatches[:5]:
+            logger.warning(f"Row {i} {df.iloc[i].to_dict()}: row-by-row={legacy[i]} vectorized=({codes.iat[i]}, {reasons.iat[i]})")
+        check = "ok" if not mismatches else f"{len(mismatches)} MISMATCHES"
+        print(f"{size:>10} {t_legacy:>15.3f} {t_vec:>15.3f} {t_legacy / t_vec:>7.1f}x {kept:>8}  {check}")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
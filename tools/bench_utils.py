@@ -0,0 +1,14 @@
+"""
+Utilidades comunes de los benchmarks de `tools/`.
+"""
+import time
+
+def time_call(func, driver, repeat):
+    """Returns (best seconds, result of last call)."""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(driver)
+        best = min(best, time.perf_counter() - start)
+    return best, result
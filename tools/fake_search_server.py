@@ -0,0 +1,70 @@
+"""
+Servidor local que imita el endpoint JSON de búsqueda de Wallapop sirviendo páginas grabadas.
+
+Las páginas se graban con el backend HTTP activando `scraping.http.record_dir`
+(ficheros `<slug>-<digest>_<NNN>.json`, ver `recording_name`: el digest cubre toda la
+query, así que ciudades y franjas de precio del mismo término no se pisan). El servidor
+reconoce la búsqueda por esos mismos parámetros y reescribe `meta.next_page` para que el
+cliente pagine por los ficheros en orden.
+
+Uso:
+    uv run python -m tools.fake_search_server data/http_pages --port 8765
+    WALLAPOP_API_URL=http://127.0.0.1:8765/api/v3/search uv run python -m src.main --scraper-backend=http
+"""
+import argparse
+import json
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import urlparse, parse_qs, parse_qsl
+
+from src.http_search import recording_name
+
+logger = logging.getLogger(__name__)
+
+def make_handler(pages_dir):
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            raw_query = urlparse(self.path).query
+            query = parse_qs(raw_query)
+            if "next_page" in query:
+                slug, _, page = query["next_page"][0].rpartition(":")
+                page = int(page)
+            else:
+                slug, page = recording_name(parse_qsl(raw_query)), 0
+
+            path = pages_dir / f"{slug}_{page:03d}.json"
+            if not path.exists():
+                self.send_error(404, f"No recorded page {path.name}")
+                return
+
+            with open(path, "r", encoding="utf-8") as f:
+                payload = json.load(f)
+            has_next = (pages_dir / f"{slug}_{page + 1:03d}.json").exists()
+            payload.setdefault("meta", {})["next_page"] = f"{slug}:{page + 1}" if has_next else None
+
+            body = json.dumps(payload).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            logger.info(format % args)
+
+    return Handler
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve recorded Wallapop search JSON pages")
+    parser.add_argument("pages_dir", help="Directory with <slug>-<digest>_<NNN>.json pages")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", args.port), make_handler(Path(args.pages_dir)))
+    logger.info(f"Serving {args.pages_dir} on http://127.0.0.1:{args.port}/api/v3/search")
+    server.serve_forever()
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()